@@ -1,2 +1,31 @@
 [ansible_tower]
 
+[tower_api]
+
+param.batch = [off|list|limit|fanout]
+* Default batch mode of the alert action. See action.tower_api.param.batch in savedsearches.conf.spec.
+* Defaults to off.
+
+param.batch_workers = <integer>
+* Default number of concurrent launches in fanout mode.
+* Defaults to 4.
+
+param.dedupe_window = <number>
+* Default seconds during which repeated launches are dropped.
+* Defaults to 0 (disabled).
+
+param.queue = [0|1]
+* Whether launches go through the on-disk queue by default.
+* Defaults to 0.
+
+param.host_rate = <number>
+* Default maximum launches per second sent to the Ansible Tower host.
+* Defaults to 0 (unlimited).
+
+param.job_rate = <number>
+* Default maximum launches per second of the job template.
+* Defaults to 0 (unlimited).
+
+param.latency_stats = [0|1]
+* Whether per-phase timings are recorded as latency samples by default.
+* Defaults to 0.
@@ -15,3 +15,41 @@ action.tower_api.param.var_name = <string>
 action.tower_api.param.var_field = <string>
 * The field/column name from the alert query search results to be used as the value for extra variable.
 
+action.tower_api.param.batch = [off|list|limit|fanout]
+* How to launch for alerts with several search results. "off" launches once using the first result.
+* "list" launches one job with the extra variable set to the list of all var_field values.
+* "limit" launches one job with the values joined with commas into the job's limit host pattern.
+* "fanout" launches one job per value, batch_workers at a time.
+* Defaults to off.
+
+action.tower_api.param.batch_workers = <integer>
+* Number of concurrent launches when batch is "fanout".
+* Defaults to 4.
+
+action.tower_api.param.dedupe_window = <number>
+* Seconds during which a launch repeating an earlier one (same hostname, job_id and extra vars) is dropped.
+* For batched launches only values not already launched within the window are submitted.
+* Defaults to 0 (disabled).
+
+action.tower_api.param.queue = [0|1]
+* When 1, launches are appended to the on-disk queue in $SPLUNK_HOME/var/spool/splunk/tower_api
+  and the alert returns immediately. The drainer (tower_api.py --drain, or the dispatcher) submits
+  them, retrying connection errors and 5xx/429 responses with exponential backoff.
+* Launches that still fail are kept in failed.log in the queue directory.
+* Defaults to 0.
+
+action.tower_api.param.host_rate = <number>
+* Maximum launches per second sent to the Ansible Tower host, shared by all alerts and processes.
+  Launches over the rate wait for their turn (in the drainer when queue is 1).
+* Defaults to 0 (unlimited).
+
+action.tower_api.param.job_rate = <number>
+* Maximum launches per second of the job template on the Ansible Tower host.
+* Defaults to 0 (unlimited).
+
+action.tower_api.param.latency_stats = [0|1]
+* When 1, the per-phase timings of each alert are also recorded as samples, and
+  $SPLUNK_HOME/var/run/splunk/tower_api_latency.json is refreshed every minute with the
+  count and p50/p95/p99 of each phase per hostname and job template over the last hour.
+* Every alert logs its per-phase timings to tower_api.log regardless of this setting.
+* Defaults to 0.
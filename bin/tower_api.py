@@ -1,83 +1,799 @@
 #!/usr/bin/python
 
-import sys, urllib2, json, tower_cli, os, datetime
+import sys, urllib2, httplib, json, tower_cli, os, datetime, socket, threading, time, tempfile, gzip, csv, anydbm, shutil, hashlib, random, atexit, collections
 import splunk.entity as entity
+#Imported up front: the lazy import inside the first strptime call is not thread safe on Python 2
+import _strptime
 # Tower Connect
 #
 # This script is used as wrapper to connect to Ansible Tower API.
+#
+# Run with --execute (by Splunk) it hands the alert payload to the dispatcher
+# when one is listening, and otherwise launches the job itself. Run with
+# --dispatcher it becomes the long-lived dispatcher, which keeps credentials,
+# auth tokens and pooled HTTPS connections warm between alerts.
 
 __author__ = "Keith Rhea"
 __email__ = "keithr@mindpointgroup.com"
 __version__ = "1.0"
 
+#Unix socket the dispatcher listens on for alert payloads
+DISPATCHER_SOCKET = os.path.join(os.environ.get("SPLUNK_HOME", ""), "var", "run", "splunk", "tower_api.sock")
+
+#Number of alerts the dispatcher launches concurrently
+DISPATCHER_WORKERS = 8
+
+#Seconds the dispatcher waits on a client for its payload or its receipt of the ack
+DISPATCHER_READ_TIMEOUT = 2
+
+#Seconds resolved credentials are reused before asking Splunk again
+CREDENTIAL_TTL = 300
+
+#Auth tokens shared by every invocation, keyed by "hostname/realm"
+TOKEN_CACHE = os.path.join(os.environ.get("SPLUNK_HOME", ""), "var", "run", "splunk", "tower_api_tokens.json")
+
+#Recent launches shared by every invocation, for dropping repeated alerts
+LAUNCH_STATE = os.path.join(os.environ.get("SPLUNK_HOME", ""), "var", "run", "splunk", "tower_api_launches.json")
+
+#Log file, written as JSON lines and rotated by size
+LOG_FILE = os.path.join(os.environ.get("SPLUNK_HOME", ""), "var", "log", "splunk", "tower_api.log")
+LOG_MAX_BYTES = 25 * 1024 * 1024
+LOG_BACKUPS = 5
+
+#Log lines are buffered and written together once this many bytes are pending
+#or LOG_FLUSH_INTERVAL seconds have passed, and always at exit
+LOG_BUFFER_BYTES = 64 * 1024
+LOG_FLUSH_INTERVAL = 1
+
+#Token buckets limiting launches per Tower host and per job template
+RATE_STATE = os.path.join(os.environ.get("SPLUNK_HOME", ""), "var", "run", "splunk", "tower_api_ratelimit.json")
+
+#Spool of queued launch requests, one append-only segment file per minute
+QUEUE_DIR = os.path.join(os.environ.get("SPLUNK_HOME", ""), "var", "spool", "splunk", "tower_api")
+QUEUE_CHECKPOINT = os.path.join(QUEUE_DIR, "checkpoint.json")
+QUEUE_FAILED = os.path.join(QUEUE_DIR, "failed.log")
+
+#Number of queued launches the drainer submits concurrently
+QUEUE_WORKERS = 4
+
+#Retries of a queued launch, with exponential backoff between them in seconds
+QUEUE_MAX_ATTEMPTS = 10
+QUEUE_BACKOFF_BASE = 1
+QUEUE_BACKOFF_CAP = 300
+
+#Seconds the drainer waits before looking for new queued launches
+QUEUE_POLL = 1
+
+#Format of the "expires" timestamp Tower returns with a token
+TOWER_DATETIME_FMT = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+#Cached tokens are renewed this long before Tower would expire them
+TOKEN_EXPIRY_MARGIN = datetime.timedelta(seconds=60)
+
+#Distinct result values held in memory before deduplication spills to disk
+DEDUPE_MEMORY_LIMIT = 100000
+
+#Per-invocation latency samples, and the percentiles computed from them
+LATENCY_SAMPLES = os.path.join(os.environ.get("SPLUNK_HOME", ""), "var", "run", "splunk", "tower_api_latency.log")
+LATENCY_STATS = os.path.join(os.environ.get("SPLUNK_HOME", ""), "var", "run", "splunk", "tower_api_latency.json")
+
+#Seconds between refreshes of LATENCY_STATS, and the period its percentiles cover
+LATENCY_REFRESH = 60
+LATENCY_WINDOW = 3600
+
+#Samples are rolled over to LATENCY_SAMPLES.1 past this size
+LATENCY_MAX_BYTES = 5 * 1024 * 1024
+
+#Resolved credentials by realm and auth tokens by "hostname/realm"
+_credentials = {}
+_tokens = {}
+
+#Pooled connections kept alive per Tower host, and the number of Tower hosts pooled
+POOL_MAXSIZE = 16
+POOL_CONNECTIONS = 10
+
+#Shared tower_cli Client, created on first use
+_client = None
+_client_lock = threading.Lock()
+
+#Persistent HTTPS connections by hostname, one set per thread, used without requests
+_connections = threading.local()
+
+try:
+	from requests.adapters import HTTPAdapter
+	from tower_cli.api import Client, CONNECTION_RETRIES
+	from tower_cli import exceptions as tower_exceptions
+except ImportError:
+	Client = None
+
+try:
+	import fcntl
+except ImportError:
+	fcntl = None
+
+#Monotonic clock where the interpreter provides one
+monotonic = getattr(time, 'monotonic', time.time)
+
+#Milliseconds spent per phase by the alert currently handled on this thread, and
+#by the launch it is currently submitting
+_invocation = threading.local()
+
+class Timings(object):
+	def __init__(self):
+		self.started = monotonic()
+		self.phases = {}
+		self.lock = threading.Lock()
+
+	def add(self, phase, ms):
+		with self.lock:
+			self.phases[phase] = self.phases.get(phase, 0) + ms
+
+#Decorator and context manager adding the time spent in a phase to the current alert's timings
+class timed(object):
+	def __init__(self, phase):
+		self.phase = phase
+
+	def __call__(self, function):
+		def wrapper(*args, **kwargs):
+			with timed(self.phase):
+				return function(*args, **kwargs)
+		wrapper.__name__ = function.__name__
+		wrapper.__doc__ = function.__doc__
+		return wrapper
+
+	def __enter__(self):
+		self.started = monotonic()
+		return self
+
+	def __exit__(self, *exc_info):
+		ms = int((monotonic() - self.started) * 1000)
+		for timings in (getattr(_invocation, 'timings', None), getattr(_invocation, 'launch', None)):
+			if timings is not None:
+				timings.add(self.phase, ms)
+
 #Securely retrieve Ansible Tower Credentials from Splunk REST API password endpoint
+#Credentials are kept in memory for CREDENTIAL_TTL seconds, so a dispatcher
+#resolves each realm once rather than once per alert.
+@timed('credentials')
 def getCredentials(sessionKey,realm):
+   cached = _credentials.get(realm)
+   if cached and time.time() - cached[0] < CREDENTIAL_TTL:
+      return cached[1]
+
    myapp = 'alert_ansible_tower'
+   entities = {}
    try:
-      # list all credentials
-      entities = entity.getEntities(['admin', 'passwords'], namespace=myapp,
-                                    owner='nobody', sessionKey=sessionKey)
+      # list only the credentials stored for this realm
+      entities = entity.getEntities(['storage', 'passwords'], namespace=myapp,
+                                    owner='nobody', sessionKey=sessionKey,
+                                    search='realm=' + str(realm), count=0)
    except Exception, e:
       log("Could not get %s credentials from splunk. Error: %s"
                       % (myapp, str(e)))
 
-   # return first set of credentials
+   # return first set of credentials for the realm
    for i, c in entities.items():
         if c.get('realm')  == realm:
+            _credentials[realm] = (time.time(), (c['username'], c['clear_password']))
             return c['username'], c['clear_password']
 
    log("ERROR: No credentials have been found")
 
+#POST JSON to Tower and return the decoded response. Requests go through a shared
+#tower_cli Client, whose connection pool keeps HTTPS connections to each Tower host
+#alive between requests, alerts and threads; without the requests library they use
+#persistent httplib connections instead.
+#Errors are raised as urllib2.URLError/HTTPError so callers can handle them the same way.
+def tower_request(hostname,path,data,token=None):
+	headers = {"Content-Type": "application/json"}
+	if token:
+		headers["authorization"] = 'Token ' + token
+	if Client is None:
+		return tower_request_httplib(hostname,path,data,headers)
+
+	url = 'https://' + hostname + path
+	try:
+		response = pooled_client()._make_request('POST', url, [], {
+			"data": json.dumps(data),
+			"headers": headers,
+			"timeout": 30
+		})
+	except tower_exceptions.TowerCLIError as error:
+		raise urllib2.URLError(error)
+	if response.status_code >= 400:
+		raise urllib2.HTTPError(url, response.status_code, response.reason, response.headers, None)
+	return response.json()
+
+#Return the process-wide tower_cli Client, created on first use with a connection
+#pool of POOL_MAXSIZE connections for each of up to POOL_CONNECTIONS Tower hosts.
+def pooled_client():
+	global _client
+	with _client_lock:
+		if _client is None:
+			_client = Client()
+			adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=CONNECTION_RETRIES)
+			_client.mount('https://', adapter)
+			_client.mount('http://', adapter)
+		return _client
+
+def tower_request_httplib(hostname,path,data,headers):
+	pool = _connections.__dict__.setdefault('pool', {})
+	for attempt in (0, 1):
+		conn = pool.get(hostname)
+		if conn is None:
+			conn = pool[hostname] = httplib.HTTPSConnection(hostname, timeout=30)
+		try:
+			conn.request('POST', path, json.dumps(data), headers)
+			response = conn.getresponse()
+			body = response.read()
+		except (httplib.HTTPException, socket.error) as error:
+			#The server may have closed an idle keep-alive connection; reconnect once
+			conn.close()
+			pool.pop(hostname, None)
+			if attempt:
+				raise urllib2.URLError(error)
+			continue
+		if response.status >= 400:
+			raise urllib2.HTTPError('https://' + hostname + path, response.status,
+				response.reason, response.msg, None)
+		return json.loads(body)
+
+#Read a JSON state file shared between invocations, or {} if it is missing or damaged
+def read_state(path):
+	try:
+		with open(path) as f:
+			state = json.load(f)
+		if isinstance(state, dict):
+			return state
+	except (IOError, ValueError):
+		pass
+	return {}
+
+#Replace a JSON state file by atomic rename so concurrent readers never see a partial write
+def write_state(path, state):
+	fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.' + os.path.basename(path))
+	with os.fdopen(fd, 'w') as f:
+		json.dump(state, f)
+	os.rename(tmp, path)
+
+#Exclusive lock serializing read-modify-write of a state file across processes
+class state_lock(object):
+	def __init__(self, path):
+		self.path = path + '.lock'
+	def __enter__(self):
+		self.f = open(self.path, 'a')
+		if fcntl:
+			fcntl.flock(self.f, fcntl.LOCK_EX)
+		return self
+	def __exit__(self, *exc_info):
+		self.f.close()
+
+#Return the token cached under key if it is not about to expire.
+def cached_token(key):
+	entry = _tokens.get(key)
+	if entry is None:
+		entry = read_state(TOKEN_CACHE).get(key)
+	try:
+		expires = datetime.datetime.strptime(entry['expires'], TOWER_DATETIME_FMT)
+		if datetime.datetime.utcnow() + TOKEN_EXPIRY_MARGIN < expires:
+			_tokens[key] = entry
+			return entry['token']
+	except (KeyError, TypeError, ValueError):
+		pass
+	_tokens.pop(key, None)
+
+#Store (or with entry=None, remove) a token in the shared cache file.
+def store_token(key, entry):
+	with state_lock(TOKEN_CACHE):
+		cache = read_state(TOKEN_CACHE)
+		if entry is None:
+			_tokens.pop(key, None)
+			cache.pop(key, None)
+		else:
+			_tokens[key] = entry
+			cache[key] = entry
+		write_state(TOKEN_CACHE, cache)
+
+#Lock serializing token acquisition for one "hostname/realm" across processes,
+#so that a slow Tower host does not hold up authentication to any other.
+def token_lock(key):
+	return state_lock(TOKEN_CACHE + '.' + hashlib.sha1(key).hexdigest())
+
 #Connect to Tower and authenticate using user/pass to receive auth token.
-def tower_auth(hostname,username,password):
-	try:
-		req = urllib2.Request(
-			url = 'https://' + hostname + '/api/v2/authtoken/',
-			headers = {
-				"Content-Type": "application/json"
-			},
-			data = json.dumps({
+#Tokens are cached per host and realm until shortly before they expire, and
+#acquisition is serialized across processes per host and realm, so that a burst
+#of alerts waits for one authentication instead of each performing its own.
+@timed('auth')
+def tower_auth(hostname,username,password,realm=None):
+	key = '%s/%s' % (hostname, realm or username)
+	token = cached_token(key)
+	if token:
+		return token
+	try:
+		with token_lock(key):
+			#Another process may have authenticated while we waited for the lock
+			_tokens.pop(key, None)
+			token = cached_token(key)
+			if token:
+				return token
+			results = tower_request(hostname, '/api/v2/authtoken/', {
 				"username": username,
 				"password": password
 			})
-		)
-		response = urllib2.urlopen(req)
-		results = json.loads(response.read())
-		token = results['token']
-		return token
+			store_token(key, {"token": results['token'], "expires": results['expires']})
+			return results['token']
 	except urllib2.URLError as error:
 		log(error.reason)
+	except (IOError, OSError) as error:
+		log("ERROR: Could not update token cache: " + str(error))
 
-def tower_launch(hostname,username,password,job_id,extra_vars):
-	
-	#Authenticate to Ansible Tower and receive Auth Token.
-	token = tower_auth(hostname,username,password)
-	
-	#Attempt to Launch Ansible Tower Job Template
-	try:
-		req = urllib2.Request(
-			url = 'https://' + hostname + '/api/v2/job_templates/' + job_id +'/launch/',
-			headers = {
-				"Content-Type": "application/json",
-				"authorization": 'Token ' + token
-			},
-			data = json.dumps({
-				"extra_vars": extra_vars
-			})
-		)
-		response = urllib2.urlopen(req)
-		results = json.loads(response.read())
-		log("Job ID: " + str(results['job']) + " submitted successfully.")
+#Drop a token Tower has rejected so no other invocation reuses it.
+def forget_token(hostname,username,realm=None):
+	key = '%s/%s' % (hostname, realm or username)
+	try:
+		store_token(key, None)
+	except (IOError, OSError) as error:
+		log("ERROR: Could not update token cache: " + str(error))
+
+#Drop or trim a launch that repeats one made within the last window seconds.
+#Launches match on hostname, job_id and extra_vars; list-valued extra vars and
+#the limit host pattern match regardless of their values, and only values not
+#already launched in the window are kept. Returns the (extra_vars, limit, undo)
+#still to launch, or None when nothing new is left; pass undo to forget_launch
+#if the launch is not submitted after all.
+def coalesce_launch(hostname,job_id,extra_vars,limit,window):
+	lists = {}
+	scalars = extra_vars
+	if isinstance(extra_vars, dict):
+		lists = dict((k, v) for k, v in extra_vars.items() if isinstance(v, list))
+		scalars = dict((k, v) for k, v in extra_vars.items() if k not in lists)
+	elif isinstance(extra_vars, basestring):
+		scalars = extra_vars.strip()
+	if limit:
+		lists[':limit'] = limit.split(',')
+	key = hashlib.sha1(json.dumps([hostname, str(job_id), scalars, sorted(lists)], sort_keys=True)).hexdigest()
+
+	now = time.time()
+	with timed('dedupe'), state_lock(LAUNCH_STATE):
+		state = dict((k, v) for k, v in read_state(LAUNCH_STATE).items() if now - v['time'] < window)
+		repeated = key in state
+		entry = state.setdefault(key, {'time': now, 'values': {}})
+		fresh = {}
+		for name, values in lists.items():
+			launched = set(entry['values'].get(name, []))
+			fresh[name] = [value for value in values if value not in launched]
+			entry['values'][name] = list(launched) + fresh[name]
+		write_state(LAUNCH_STATE, state)
+
+	#An exact repeat, or a batch whose values were all launched already
+	if repeated and not any(fresh.values()):
+		return None
+
+	undo = (key, dict(fresh), not repeated)
+	if fresh:
+		limit = ','.join(fresh.pop(':limit', []))
+		if isinstance(extra_vars, dict):
+			extra_vars = dict(extra_vars, **fresh)
+	return extra_vars, limit, undo
+
+#Take back a launch recorded by coalesce_launch that was not submitted, so that
+#the next trigger within the window launches it instead of being dropped.
+def forget_launch(undo):
+	key, fresh, created = undo
+	with state_lock(LAUNCH_STATE):
+		state = read_state(LAUNCH_STATE)
+		entry = state.get(key)
+		if entry is None:
+			return
+		for name, values in fresh.items():
+			entry['values'][name] = [value for value in entry['values'].get(name, []) if value not in values]
+		#Drop the entry we created unless another launch has merged values into it since
+		if created and not any(entry['values'].values()):
+			del state[key]
+		write_state(LAUNCH_STATE, state)
+
+#Block until the token buckets of the Tower host (host_rate launches per second)
+#and of the job template (job_rate launches per second) allow one more launch.
+#Buckets hold up to one second of launches and are shared by every process.
+@timed('throttle')
+def throttle(hostname,job_id,host_rate=0,job_rate=0):
+	buckets = []
+	if host_rate > 0:
+		buckets.append((hostname, host_rate))
+	if job_rate > 0:
+		buckets.append((hostname + '/' + str(job_id), job_rate))
+
+	while buckets:
+		now = time.time()
+		with state_lock(RATE_STATE):
+			state = read_state(RATE_STATE)
+			wait = 0
+			levels = {}
+			for key, rate in buckets:
+				capacity = max(1.0, rate)
+				tokens, updated = state.get(key, (capacity, now))
+				levels[key] = min(capacity, tokens + (now - updated) * rate)
+				if levels[key] < 1:
+					wait = max(wait, (1 - levels[key]) / rate)
+			if not wait:
+				for key, rate in buckets:
+					state[key] = (levels[key] - 1, now)
+				write_state(RATE_STATE, state)
+				return
+		time.sleep(wait)
+
+#Authenticate and launch the Ansible Tower Job Template, returning Tower's response.
+#Errors are raised as urllib2.URLError/HTTPError.
+#queued is the time a queued launch was enqueued, to report how long it waited.
+#The launch is logged with the time spent in each of its own phases, which are
+#also added to the timings of the alert being handled, if any.
+def launch_job(hostname,username,password,job_id,extra_vars,realm=None,limit=None,host_rate=0,job_rate=0,queued=None):
+	started = time.time()
+	timings = _invocation.launch = Timings()
+	try:
+		#Wait for the rate limits of the Tower host and job template
+		try:
+			throttle(hostname,job_id,host_rate,job_rate)
+		except (IOError, OSError) as error:
+			log("ERROR: Could not update rate limit state: " + str(error))
+
+		#Authenticate to Ansible Tower and receive Auth Token.
+		token = tower_auth(hostname,username,password,realm)
+
+		#Build the launch request; limit is only sent when a host pattern was given
+		data = {"extra_vars": extra_vars}
+		if limit:
+			data["limit"] = limit
+
+		#Attempt to Launch Ansible Tower Job Template
+		try:
+			with timed('launch'):
+				results = tower_request(hostname, '/api/v2/job_templates/' + str(job_id) + '/launch/',
+					data, token)
+		except urllib2.HTTPError as error:
+			#A cached token may have been revoked; authenticate again once
+			if error.code != 401:
+				raise
+			forget_token(hostname,username,realm)
+			token = tower_auth(hostname,username,password,realm)
+			with timed('launch'):
+				results = tower_request(hostname, '/api/v2/job_templates/' + str(job_id) + '/launch/',
+					data, token)
+	finally:
+		_invocation.launch = None
+	phases = dict((phase + '_ms', ms) for phase, ms in timings.phases.items())
+	if queued:
+		phases["queue_ms"] = int((started - queued) * 1000)
+	log("Job ID: " + str(results['job']) + " submitted successfully.",
+		job=results['job'], hostname=hostname, job_template=job_id, **phases)
+	return results
+
+#Drop triggers repeating a launch made within the dedupe window. Returns the
+#(extra_vars, limit, undo) to launch, or None if the launch should be skipped.
+#undo is None when nothing was recorded, otherwise see coalesce_launch.
+def dedupe_launch(job_id,hostname,extra_vars,limit,dedupe_window):
+	if dedupe_window <= 0:
+		return extra_vars, limit, None
+	try:
+		launch = coalesce_launch(hostname,job_id,extra_vars,limit,dedupe_window)
+	except (IOError, OSError) as error:
+		log("ERROR: Could not update launch state: " + str(error))
+		return extra_vars, limit, None
+	if launch is None:
+		log("Duplicate launch of job template " + str(job_id) + " within " + str(dedupe_window) + "s dropped.")
+	return launch
+
+#Let a trigger within the dedupe window retry a launch that failed, given the
+#undo returned by dedupe_launch
+def undo_dedupe(undo):
+	if undo is None:
+		return
+	try:
+		forget_launch(undo)
+	except (IOError, OSError) as error:
+		log("ERROR: Could not update launch state: " + str(error))
+
+def tower_launch(hostname,username,password,job_id,extra_vars,realm=None,limit=None,dedupe_window=0,host_rate=0,job_rate=0):
+	launch = dedupe_launch(job_id,hostname,extra_vars,limit,dedupe_window)
+	if launch is None:
+		return
+	try:
+		launch_job(hostname,username,password,job_id,launch[0],realm,launch[1],host_rate,job_rate)
 	except urllib2.URLError as error:
+		undo_dedupe(launch[2])
 		log(error.reason)
-#Logging Function 
-def log(settings):
-    f = open(os.path.join(os.environ["SPLUNK_HOME"], "var", "log", "splunk", "tower_api.log"), "a")
-    print >> f, str(datetime.datetime.now().isoformat()), settings 
-    f.close()
+	except Exception:
+		undo_dedupe(launch[2])
+		raise
+
+#Append a launch request to the current minute's queue segment and return at once.
+#The record carries the session key so the drainer can resolve credentials later,
+#and the dedupe undo so a launch the drainer gives up on can be triggered again.
+def enqueue_launch(sessionKey,hostname,realm,job_id,extra_vars,limit=None,dedupe_window=0,host_rate=0,job_rate=0):
+	launch = dedupe_launch(job_id,hostname,extra_vars,limit,dedupe_window)
+	if launch is None:
+		return
+	if not os.path.isdir(QUEUE_DIR):
+		try:
+			os.makedirs(QUEUE_DIR, 0o700)
+		except OSError:
+			pass
+	record = json.dumps({
+		"session_key": sessionKey,
+		"hostname": hostname,
+		"realm": realm,
+		"job_id": job_id,
+		"extra_vars": launch[0],
+		"limit": launch[1],
+		"host_rate": host_rate,
+		"job_rate": job_rate,
+		"queued": time.time(),
+		"undo": launch[2]
+	}) + '\n'
+	segment = os.path.join(QUEUE_DIR, time.strftime('%Y%m%d%H%M', time.gmtime()) + '.seg')
+	try:
+		fd = os.open(segment, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+		try:
+			os.write(fd, record)
+		finally:
+			os.close(fd)
+	except (IOError, OSError):
+		undo_dedupe(launch[2])
+		raise
+
+#Submit one queued launch, retrying connection errors, 5xx and 429 responses with
+#jittered exponential backoff. Launches that cannot be submitted are kept in QUEUE_FAILED.
+def drain_record(line):
+	try:
+		record = json.loads(line)
+	except ValueError:
+		log("ERROR: Skipping unreadable queued launch: " + line.strip())
+		return
+
+	for attempt in range(QUEUE_MAX_ATTEMPTS):
+		if attempt:
+			time.sleep(random.uniform(0, min(QUEUE_BACKOFF_CAP, QUEUE_BACKOFF_BASE * 2 ** attempt)))
+		try:
+			#An expired session key still leaves any cached Tower token usable
+			username, password = getCredentials(record['session_key'], record['realm']) or (None, None)
+			launch_job(record['hostname'],username,password,record['job_id'],
+				record['extra_vars'],record['realm'],record['limit'],
+				record.get('host_rate', 0),record.get('job_rate', 0),record.get('queued'))
+			return
+		except urllib2.HTTPError as error:
+			if error.code < 500 and error.code != 429:
+				log("ERROR: Queued launch rejected by Tower: " + str(error.reason))
+				break
+			log("Queued launch failed (" + str(error.reason) + "), attempt " + str(attempt + 1))
+		except urllib2.URLError as error:
+			log("Queued launch failed (" + str(error.reason) + "), attempt " + str(attempt + 1))
+		except Exception as error:
+			#Not worth retrying, but it must not stop the drainer from moving past it
+			log("ERROR: Queued launch failed: " + repr(error))
+			break
+
+	with open(QUEUE_FAILED, 'a') as f:
+		f.write(line)
+	if isinstance(record, dict):
+		undo_dedupe(record.get('undo'))
+
+#Submit queued launches in order from QUEUE_WORKERS threads, checkpointing the
+#position reached so a restarted drainer resumes where it stopped. Drained
+#segments are removed once their minute has passed. Returns immediately if
+#another drainer is already running.
+def drain():
+	from multiprocessing.pool import ThreadPool
+
+	if not os.path.isdir(QUEUE_DIR):
+		try:
+			os.makedirs(QUEUE_DIR, 0o700)
+		except OSError:
+			pass
+	lock = open(os.path.join(QUEUE_DIR, 'drain.lock'), 'a')
+	if fcntl:
+		try:
+			fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+		except IOError:
+			lock.close()
+			return
+	pool = ThreadPool(QUEUE_WORKERS)
+	log("Drainer started on " + QUEUE_DIR)
+
+	try:
+		while True:
+			checkpoint = read_state(QUEUE_CHECKPOINT)
+			for segment in sorted(name for name in os.listdir(QUEUE_DIR) if name.endswith('.seg')):
+				path = os.path.join(QUEUE_DIR, segment)
+				offset = checkpoint.get(segment, 0)
+				with open(path) as f:
+					while True:
+						#Only complete lines are submitted; a partial one is still being written
+						f.seek(offset)
+						lines = []
+						for line in iter(f.readline, ''):
+							if not line.endswith('\n'):
+								break
+							lines.append(line)
+							if len(lines) == QUEUE_WORKERS * 4:
+								break
+						if not lines:
+							break
+						pool.map(drain_record, lines)
+						offset += sum(len(line) for line in lines)
+						checkpoint[segment] = offset
+						write_state(QUEUE_CHECKPOINT, checkpoint)
+				if segment < time.strftime('%Y%m%d%H%M', time.gmtime(time.time() - 120)) + '.seg':
+					os.unlink(path)
+					checkpoint.pop(segment, None)
+					write_state(QUEUE_CHECKPOINT, checkpoint)
+			flush_log()
+			time.sleep(QUEUE_POLL)
+	finally:
+		pool.terminate()
+		lock.close()
+
+#Yield each distinct, non-empty value of the var_field column(s) in the gzipped
+#CSV results_file. var_field may list several comma separated columns. Rows are
+#decompressed and parsed one at a time and only the projected columns are kept,
+#so memory use does not grow with the size of the results.
+def read_results(results_file,var_field):
+	f = gzip.open(results_file, 'rb')
+	seen = distinct_values()
+	try:
+		reader = csv.reader(f)
+		header = next(reader, [])
+		fields = [field.strip() for field in str(var_field).split(',')]
+		columns = [header.index(field) for field in fields if field in header]
+		for row in reader:
+			for column in columns:
+				if column < len(row) and row[column] and seen.add(row[column]):
+					yield row[column]
+	finally:
+		seen.close()
+		f.close()
+
+#Set of values seen so far. Holds up to DEDUPE_MEMORY_LIMIT values in memory,
+#then moves them to a temporary on-disk database and continues there.
+class distinct_values(object):
+	def __init__(self):
+		self.memory = set()
+		self.disk = None
+		self.tmpdir = None
+
+	#Record value and return True if it had not been seen before
+	def add(self, value):
+		if self.disk is not None:
+			if self.disk.has_key(value):
+				return False
+			self.disk[value] = ''
+			return True
+		if value in self.memory:
+			return False
+		self.memory.add(value)
+		if len(self.memory) > DEDUPE_MEMORY_LIMIT:
+			self.tmpdir = tempfile.mkdtemp(prefix='tower_api')
+			self.disk = anydbm.open(os.path.join(self.tmpdir, 'seen'), 'n')
+			for seen in self.memory:
+				self.disk[seen] = ''
+			self.memory = set()
+		return True
+
+	def close(self):
+		if self.disk is not None:
+			self.disk.close()
+			shutil.rmtree(self.tmpdir, ignore_errors=True)
+			self.disk = None
+
+#Launch once for all search results of the alert, according to the batch mode:
+#  list   - one job, extra var set to the list of all values
+#  limit  - one job, values joined with commas into the job's limit host pattern
+#  fanout - one job per value, launched from a pool of batch_workers threads
+#launch is called as launch(extra_vars, limit) for every job to submit.
+def batch_launch(launch,var_name,values,batch,workers):
+	if batch == 'fanout':
+		from multiprocessing.pool import ThreadPool
+		pool = ThreadPool(workers)
+
+		#Only read ahead of the workers by a bounded number of values
+		slots = threading.BoundedSemaphore(workers * 2)
+		def launch_value(value):
+			try:
+				launch(str(var_name) + ": " + str(value), None)
+			except Exception as error:
+				log("ERROR: Launch for value " + str(value) + " failed: " + str(error))
+			finally:
+				slots.release()
+		try:
+			for value in values:
+				slots.acquire()
+				pool.apply_async(launch_value, (value,))
+		finally:
+			pool.close()
+			pool.join()
+		return
+
+	values = list(values)
+	if not values:
+		log("No values for batched launch; nothing submitted.")
+	elif batch == 'limit':
+		launch({}, ','.join(values))
+	else:
+		launch({var_name: values}, None)
+
+#Logging Function: append one JSON line per message, with any extra fields.
+#Lines are buffered and written to LOG_FILE with a single O_APPEND write, so lines
+#from concurrent invocations never interleave.
+_log = {"buffer": [], "size": 0, "flushed": time.time(), "fd": None}
+_log_lock = threading.Lock()
+
+def log(settings, **fields):
+    record = collections.OrderedDict([
+        ("time", datetime.datetime.now().isoformat()),
+        ("pid", os.getpid()),
+        ("message", str(settings))
+    ])
+    record.update(sorted(fields.items()))
+    line = json.dumps(record) + "\n"
+    with _log_lock:
+        _log["buffer"].append(line)
+        _log["size"] += len(line)
+        if _log["size"] >= LOG_BUFFER_BYTES or time.time() - _log["flushed"] >= LOG_FLUSH_INTERVAL:
+            flush_log_locked()
+
+def flush_log():
+    with _log_lock:
+        flush_log_locked()
+
+def flush_log_locked():
+    _log["flushed"] = time.time()
+    if not _log["buffer"]:
+        return
+    data = "".join(_log["buffer"])
+    _log["buffer"] = []
+    _log["size"] = 0
+    try:
+        #Reopen if another process rotated the file away from us
+        if _log["fd"] is not None and os.fstat(_log["fd"]).st_ino != os.stat(LOG_FILE).st_ino:
+            os.close(_log["fd"])
+            _log["fd"] = None
+    except OSError:
+        os.close(_log["fd"])
+        _log["fd"] = None
+    try:
+        if _log["fd"] is None:
+            _log["fd"] = os.open(LOG_FILE, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        os.write(_log["fd"], data)
+        if os.fstat(_log["fd"]).st_size >= LOG_MAX_BYTES:
+            rotate_log()
+    except (IOError, OSError):
+        pass
+
+#Rename tower_api.log to tower_api.log.1 and so on, keeping LOG_BACKUPS old files
+def rotate_log():
+    with state_lock(LOG_FILE):
+        #Another process may have rotated while we waited for the lock
+        if os.stat(LOG_FILE).st_size < LOG_MAX_BYTES:
+            return
+        for i in range(LOG_BACKUPS - 1, 0, -1):
+            if os.path.exists("%s.%d" % (LOG_FILE, i)):
+                os.rename("%s.%d" % (LOG_FILE, i), "%s.%d" % (LOG_FILE, i + 1))
+        os.rename(LOG_FILE, LOG_FILE + ".1")
+    os.close(_log["fd"])
+    _log["fd"] = None
+
+atexit.register(flush_log)
 
 
 def main(payload):
+	#Time each phase of this alert, and the alert as a whole
+	timings = _invocation.timings = Timings()
+	try:
+		run(payload, timings)
+	finally:
+		_invocation.timings = None
+		report_timings(payload, timings)
+
+def run(payload, timings):
 	#Retrieve session key from payload to authenticate to Splunk REST API for secure credential retrieval
 	sessionKey = payload.get('session_key')
 
@@ -96,28 +812,239 @@ def main(payload):
 	#Retrieve Ansible Tower extra_vars Field to pull search value from Payload configuration
 	var_field = payload['configuration'].get('var_field')
 
+	#Retrieve batch mode from Payload configuration (off, list, limit or fanout)
+	batch = payload['configuration'].get('batch') or 'off'
+
+	#Retrieve seconds within which repeated launches are dropped (0 disables)
+	dedupe_window = float(payload['configuration'].get('dedupe_window') or 0)
+
+	#Retrieve launches per second allowed to the Tower host and to the job template (0 is unlimited)
+	host_rate = float(payload['configuration'].get('host_rate') or 0)
+	job_rate = float(payload['configuration'].get('job_rate') or 0)
+
+	#Queue launches for the drainer instead of submitting them to Tower now
+	if payload['configuration'].get('queue') in ('1', 'true'):
+		def launch(extra_vars, limit):
+			#Fan-out workers report into this alert's timings too
+			_invocation.timings = timings
+			with timed('enqueue'):
+				enqueue_launch(sessionKey,hostname,realm,job_id,extra_vars,limit,dedupe_window,host_rate,job_rate)
+	else:
+		#Retrive Ansible Tower Credentials from Splunk REST API
+		username, password = getCredentials(sessionKey,realm)
+
+		def launch(extra_vars, limit):
+			#Fan-out workers report into this alert's timings too
+			_invocation.timings = timings
+			tower_launch(hostname,username,password,job_id,extra_vars,realm,limit,dedupe_window,host_rate,job_rate)
+
+	#Submit one Ansible Tower Job for all search results
+	if batch != 'off':
+		workers = int(payload['configuration'].get('batch_workers') or 4)
+		values = read_results(payload['results_file'], var_field)
+		batch_launch(launch,var_name,values,batch,workers)
+		return
+
 	#Retrieve Ansible Tower extra_vars value from Payload configuration
 	var_value = payload['result'].get(var_field)
 
 	#Assign extra_vars variable a value
 	extra_vars = str(var_name) + ": " + str(var_value)
 
-	#Retrive Ansible Tower Credentials from Splunk REST API
-	username, password = getCredentials(sessionKey,realm)
-
 	#Submit Ansible Tower Job
-	tower_launch(hostname,username,password,job_id,extra_vars)
+	launch(extra_vars, None)
+
+#Log one summary record with the per-phase timings of an alert and, when
+#latency_stats is enabled, add them to the latency samples.
+def report_timings(payload, timings):
+	sample = dict((phase + '_ms', ms) for phase, ms in timings.phases.items())
+	sample['total_ms'] = int((monotonic() - timings.started) * 1000)
+	hostname = payload['configuration'].get('hostname')
+	job_id = payload['configuration'].get('job_id')
+	log("Alert completed.", hostname=hostname, job_template=job_id, **sample)
+
+	if payload['configuration'].get('latency_stats') not in ('1', 'true'):
+		return
+	sample.update({"time": time.time(), "hostname": hostname, "job_template": job_id})
+	try:
+		fd = os.open(LATENCY_SAMPLES, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+		try:
+			os.write(fd, json.dumps(sample) + '\n')
+		finally:
+			os.close(fd)
+		refresh_latency_stats()
+	except (IOError, OSError) as error:
+		log("ERROR: Could not update latency statistics: " + str(error))
+
+#Every LATENCY_REFRESH seconds, rewrite LATENCY_STATS with the count and p50/p95/p99
+#of each phase per "hostname/job_template", over the samples of the last LATENCY_WINDOW.
+def refresh_latency_stats():
+	try:
+		if time.time() - os.stat(LATENCY_STATS).st_mtime < LATENCY_REFRESH:
+			return
+	except OSError:
+		pass
+
+	with state_lock(LATENCY_STATS):
+		#Another process may have refreshed while we waited for the lock
+		try:
+			if time.time() - os.stat(LATENCY_STATS).st_mtime < LATENCY_REFRESH:
+				return
+		except OSError:
+			pass
+
+		if os.path.getsize(LATENCY_SAMPLES) > LATENCY_MAX_BYTES:
+			os.rename(LATENCY_SAMPLES, LATENCY_SAMPLES + '.1')
+
+		since = time.time() - LATENCY_WINDOW
+		samples = {}
+		for path in (LATENCY_SAMPLES + '.1', LATENCY_SAMPLES):
+			if not os.path.exists(path):
+				continue
+			with open(path) as f:
+				for line in f:
+					try:
+						sample = json.loads(line)
+					except ValueError:
+						continue
+					if sample.get('time', 0) < since:
+						continue
+					key = '%s/%s' % (sample.get('hostname'), sample.get('job_template'))
+					for phase, ms in sample.items():
+						if phase.endswith('_ms'):
+							samples.setdefault(key, {}).setdefault(phase, []).append(ms)
+
+		stats = {}
+		for key, phases in samples.items():
+			for phase, values in phases.items():
+				values.sort()
+				stats.setdefault(key, {})[phase] = {
+					"count": len(values),
+					"p50": percentile(values, 50),
+					"p95": percentile(values, 95),
+					"p99": percentile(values, 99)
+				}
+		write_state(LATENCY_STATS, stats)
+
+#Nearest-rank percentile of a sorted list
+def percentile(values, pct):
+	return values[max(0, -(-len(values) * pct // 100) - 1)]
+
+#Hand the payload to a running dispatcher. Returns False if none accepted it.
+#The payload is sent as one line; the dispatcher acks it with OK and only runs
+#it once we confirm with GO, so an ack arriving after we gave up launches nothing.
+def dispatch(payload):
+	client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	client.settimeout(5)
+	try:
+		client.connect(DISPATCHER_SOCKET)
+		client.sendall(json.dumps(payload) + '\n')
+		if client.recv(2) != 'OK':
+			return False
+		client.sendall('GO')
+		return True
+	except socket.error:
+		return False
+	finally:
+		client.close()
+
+def dispatch_main(payload):
+	try:
+		main(payload)
+	except Exception as error:
+		log("ERROR: Dispatched alert failed: " + str(error))
+	finally:
+		flush_log()
+
+#Long-lived dispatcher: accept payloads on DISPATCHER_SOCKET and launch them
+#from a worker pool, reusing credentials, tokens and connections across alerts.
+def serve():
+	from multiprocessing.pool import ThreadPool
+
+	#Only one dispatcher may own the socket; exit quietly if it is already served
+	if dispatch_alive():
+		return
+	if os.path.exists(DISPATCHER_SOCKET):
+		os.unlink(DISPATCHER_SOCKET)
+
+	server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	umask = os.umask(0o077)
+	try:
+		server.bind(DISPATCHER_SOCKET)
+	finally:
+		os.umask(umask)
+	server.listen(128)
+	workers = ThreadPool(DISPATCHER_WORKERS)
+	log("Dispatcher listening on " + DISPATCHER_SOCKET)
+
+	#Drain queued launches alongside, unless a separate drainer is running
+	drainer = threading.Thread(target=drain_forever)
+	drainer.daemon = True
+	drainer.start()
+
+	while True:
+		conn, _ = server.accept()
+		#A stalled client must not hold up the payloads queued behind it
+		conn.settimeout(DISPATCHER_READ_TIMEOUT)
+		try:
+			chunks = []
+			chunk = conn.recv(65536)
+			while chunk:
+				chunks.append(chunk)
+				if chunk.endswith('\n'):
+					break
+				chunk = conn.recv(65536)
+			#Liveness probes connect and close without sending anything
+			if not chunks:
+				continue
+			payload = json.loads(''.join(chunks))
+			conn.sendall('OK')
+			#The client launches the alert itself if it gave up before the ack reached it
+			if conn.recv(2) != 'GO':
+				log("ERROR: Dispatcher ack was not confirmed; payload left to the client.")
+				continue
+		except (socket.error, ValueError) as error:
+			log("ERROR: Dispatcher could not read payload: " + str(error))
+			continue
+		finally:
+			conn.close()
+		workers.apply_async(dispatch_main, (payload,))
+
+def drain_forever():
+	while True:
+		try:
+			drain()
+		except Exception as error:
+			log("ERROR: Drainer stopped: " + str(error))
+		time.sleep(60)
+
+def dispatch_alive():
+	probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	try:
+		probe.connect(DISPATCHER_SOCKET)
+		return True
+	except socket.error:
+		return False
+	finally:
+		probe.close()
 
 
 
 if __name__ == "__main__":
+    # Run as the long-lived dispatcher
+    if len(sys.argv) > 1 and sys.argv[1] == "--dispatcher":
+        serve()
+    # Run as the queued launch drainer
+    elif len(sys.argv) > 1 and sys.argv[1] == "--drain":
+        drain()
     # Check if script initiated with --execute
-    if len(sys.argv) < 2 or sys.argv[1] != "--execute":
+    elif len(sys.argv) < 2 or sys.argv[1] != "--execute":
         print >> sys.stderr, "FATAL Unsupported execution mode (expected --execute flag)"
         sys.exit(1)
     else:
     	#Get Payload
     	payload = json.loads(sys.stdin.read())
     	log("Job Started")
-        #Pass Pass Payload to main function
-    	main(payload)
+        #Hand Payload to the dispatcher, or Pass Payload to main function if none is running
+    	if not dispatch(payload):
+    		main(payload)
@@ -0,0 +1,91 @@
+# Copyright 2015, Ansible, Inc.
+# Luke Sneeringer <lsneeringer@ansible.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from requests.adapters import HTTPAdapter
+
+from tower_cli.api import Client, CONNECTION_RETRIES
+
+
+class AsyncClient(object):
+    """An asyncio front end to the Ansible Tower API, for issuing many
+    requests concurrently.
+
+    Every request is made by a regular `tower_cli.api.Client` on a pool of
+    at most `max_concurrency` worker threads, so URL prefixing,
+    authentication, the mapping of error status codes to tower-cli
+    exceptions and the key-order preserving `APIResponse` are exactly those
+    of the synchronous client. The request methods return awaitables:
+
+        aclient = AsyncClient(max_concurrency=20)
+        responses = await asyncio.gather(*[
+            aclient.get('/hosts/', params={'page': page})
+            for page in range(2, 50)
+        ])
+
+    Requests beyond `max_concurrency` wait for a free worker, and the HTTP
+    connection pool is sized to match so that no connection is thrown away.
+    """
+    def __init__(self, max_concurrency=10, client=None):
+        self.max_concurrency = max_concurrency
+        self.client = client or Client()
+        if client is None:
+            for prefix in ('https://', 'http://'):
+                self.client.mount(prefix, HTTPAdapter(pool_maxsize=max_concurrency, max_retries=CONNECTION_RETRIES))
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    def request(self, method, url, *args, **kwargs):
+        """Make a request to the Ansible Tower API on a worker thread, and
+        return an awaitable for the `APIResponse`.
+        """
+        call = functools.partial(self.client.request, method, url, *args, **kwargs)
+        return asyncio.get_event_loop().run_in_executor(self.executor, call)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def options(self, url, **kwargs):
+        return self.request('OPTIONS', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+
+    def post(self, url, data=None, **kwargs):
+        return self.request('POST', url, data=data, **kwargs)
+
+    def put(self, url, data=None, **kwargs):
+        return self.request('PUT', url, data=data, **kwargs)
+
+    def patch(self, url, data=None, **kwargs):
+        return self.request('PATCH', url, data=data, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def close(self):
+        """Wait for outstanding requests and release the worker threads and
+        pooled connections.
+        """
+        self.executor.shutdown(wait=True)
+        self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -14,14 +14,23 @@
 # limitations under the License.
 
 import os
+import collections
 import contextlib
 import copy
 import functools
 import json
+import random
+import re
 import stat
+import sys
+import threading
+import time
 import warnings
 from datetime import datetime as dt
+from email.utils import parsedate_tz, mktime_tz
 
+import six
+from six.moves.urllib.parse import urlparse
 from requests.exceptions import ConnectionError, SSLError
 from requests.sessions import Session
 from requests.models import Response
@@ -31,20 +40,81 @@ from requests.auth import AuthBase, HTTPBasicAuth
 from tower_cli import exceptions as exc
 from tower_cli.conf import settings
 from tower_cli.utils import data_structures, debug, secho, supports_oauth
+from tower_cli.utils.profiling import http_profiler
 from tower_cli.constants import CUR_API_VERSION
+from tower_cli.transports import get_adapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 TOWER_DATETIME_FMT = r'%Y-%m-%dT%H:%M:%S.%fZ'
 
+# Responses worth retrying: Tower, or the proxy in front of it, is briefly
+# overloaded or restarting.
+RETRY_STATUSES = frozenset((429, 502, 503, 504))
+IDEMPOTENT_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'))
+
+# The transport adapters retry failed connections only. Retrying on error
+# responses, and honouring their Retry-After, is left to Client._make_request,
+# which counts each retry.
+CONNECTION_RETRIES = urllib3.util.Retry(total=3, status=0, respect_retry_after_header=False)
+
+# Jobs and updates, and their events and output, change while they run and are
+# polled by `wait` and `monitor`, so they are never answered from the cache.
+UNCACHED_RESOURCES = frozenset((
+    'jobs', 'job_events', 'project_updates', 'inventory_updates', 'system_jobs',
+    'ad_hoc_commands', 'ad_hoc_command_events', 'workflow_jobs', 'workflow_job_nodes',
+    'unified_jobs', 'job_host_summaries', 'events', 'stdout',
+))
+
+# A primary key in a URL path, replaced by "{id}" in endpoint templates.
+ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+# The API root and version at the front of URLs taken from Tower's own responses.
+API_VERSION_PREFIX = re.compile(r'^/?api/v[0-9]+/')
+
+clock = getattr(time, 'monotonic', time.time)
+
+# Whether plain dicts keep their keys in insertion order, so that JSON can be
+# decoded into them without losing the order Tower sent keys in.
+NATIVE_ORDERED_DICTS = sys.version_info >= (3, 7)
+_UNDECODED = object()
+
 
 class BasicTowerAuth(AuthBase):
 
+    # Whether each Tower (by URL prefix) supports legacy auth tokens, and the
+    # token in use for it with its expiry, remembered for the life of the
+    # process so that requests do not re-probe Tower or re-read the token file.
+    _token_support = {}
+    _tokens = {}
+
     def __init__(self, username, password, cli_client):
         self.username = username
         self.password = password
         self.cli_client = cli_client
         self.use_legacy_token = settings.use_token
 
+    @classmethod
+    def forget_token(cls, prefix):
+        """Discard the remembered token for the given Tower, so that the next
+        request acquires a new one. Called when Tower rejects a request with 401.
+        """
+        if cls._tokens.pop(prefix, None) is None:
+            return
+        filename = os.path.expanduser('~/.tower_cli_token.json')
+        try:
+            with open(filename) as f:
+                token_json = json.load(f)
+            token_json.pop(prefix, None)
+            with open(filename, 'w') as f:
+                json.dump(token_json, f)
+        except Exception as e:
+            debug.log('Unable to remove auth token from cache: %s' % str(e), fg='blue', bold=True)
+
     def _acquire_token(self):
         return self.cli_client._make_request(
             'POST', self.cli_client.get_prefix() + 'authtoken/', [],
@@ -53,27 +123,30 @@ class BasicTowerAuth(AuthBase):
         ).json()
 
     def _get_auth_token(self):
+        prefix = self.cli_client.get_prefix()
+        remembered = self._tokens.get(prefix)
+        if remembered and dt.utcnow() <= remembered[1]:
+            return remembered[0]
         filename = os.path.expanduser('~/.tower_cli_token.json')
         token_json = None
         try:
             with open(filename) as f:
                 token_json = json.load(f)
-            if not isinstance(token_json, dict) or self.cli_client.get_prefix() not in token_json or \
-                    'token' not in token_json[self.cli_client.get_prefix()] or \
-                    'expires' not in token_json[self.cli_client.get_prefix()] or \
-                    dt.utcnow() > dt.strptime(token_json[self.cli_client.get_prefix()]['expires'], TOWER_DATETIME_FMT):
+            if not isinstance(token_json, dict) or prefix not in token_json or \
+                    'token' not in token_json[prefix] or \
+                    'expires' not in token_json[prefix] or \
+                    dt.utcnow() > dt.strptime(token_json[prefix]['expires'], TOWER_DATETIME_FMT):
                 raise Exception("Current token expires.")
-            return 'Token ' + token_json[self.cli_client.get_prefix()]['token']
         except Exception as e:
             debug.log('Acquiring and caching auth token due to:\n%s' % str(e), fg='blue', bold=True)
             if not isinstance(token_json, dict):
                 token_json = {}
-            token_json[self.cli_client.get_prefix()] = self._acquire_token()
-            if not isinstance(token_json[self.cli_client.get_prefix()], dict) or \
-                    'token' not in token_json[self.cli_client.get_prefix()] or \
-                    'expires' not in token_json[self.cli_client.get_prefix()]:
+            token_json[prefix] = self._acquire_token()
+            if not isinstance(token_json[prefix], dict) or \
+                    'token' not in token_json[prefix] or \
+                    'expires' not in token_json[prefix]:
                 raise exc.AuthError('Invalid Tower auth token format: %s' % json.dumps(
-                    token_json[self.cli_client.get_prefix()]
+                    token_json[prefix]
                 ))
             with open(filename, 'w') as f:
                 json.dump(token_json, f)
@@ -84,7 +157,9 @@ class BasicTowerAuth(AuthBase):
                     'Unable to set permissions on {0} - {1} '.format(filename, e),
                     UserWarning
                 )
-            return 'Token ' + token_json[self.cli_client.get_prefix()]['token']
+        token = 'Token ' + token_json[prefix]['token']
+        self._tokens[prefix] = (token, dt.strptime(token_json[prefix]['expires'], TOWER_DATETIME_FMT))
+        return token
 
     def __call__(self, r):
         if 'Authorization' in r.headers:
@@ -98,10 +173,13 @@ class BasicTowerAuth(AuthBase):
                     'This version of Tower does not support OAuth2.0'
                 )
         if self.use_legacy_token:
-            resp = self.cli_client._make_request(
-                'OPTIONS', self.cli_client.get_prefix() + 'authtoken/', [], {}
-            )
-            if resp.ok:
+            prefix = self.cli_client.get_prefix()
+            if prefix not in self._token_support:
+                resp = self.cli_client._make_request(
+                    'OPTIONS', prefix + 'authtoken/', [], {}
+                )
+                self._token_support[prefix] = resp.ok
+            if self._token_support[prefix]:
                 r.headers['Authorization'] = self._get_auth_token()
             else:
                 warnings.warn(
@@ -114,6 +192,97 @@ class BasicTowerAuth(AuthBase):
         return r
 
 
+class ResponseCache(object):
+    """A per-process LRU cache of GET responses with a time to live.
+
+    Entries are keyed on the full URL, the query parameters and the user
+    making the request. An entry older than `ttl` seconds is not served as
+    is; if Tower sent an ETag with it, the caller may revalidate it with
+    If-None-Match and `refresh` it on a 304 instead of reading it again.
+    """
+    def __init__(self):
+        self._entries = data_structures.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(url, params):
+        if isinstance(params, dict):
+            params = params.items()
+        params = tuple(sorted((six.text_type(k), six.text_type(v)) for k, v in params or ()))
+        return (settings.username, url, params)
+
+    def get(self, key):
+        """Return a 2-tuple of the cached response, or None, and whether it
+        is still fresh.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None, False
+            self._entries[key] = entry
+        stored, response = entry
+        return response, time.time() - stored < settings.cache_ttl
+
+    def put(self, key, response):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time(), response)
+            while len(self._entries) > max(settings.cache_size, 1):
+                self._entries.popitem(last=False)
+
+    def refresh(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries[key] = (time.time(), self._entries[key][1])
+
+    def invalidate(self, endpoint):
+        """Drop every entry for a URL under the given resource endpoint."""
+        with self._lock:
+            for key in [k for k in self._entries if k[1].startswith(endpoint)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_insecure_hosts = set()
+
+
+def _ignore_insecure_warnings(host):
+    """Stop urllib3 warning about unverified HTTPS requests to the given
+    Tower host, which are only made when asked to. Warnings about any other
+    host are left alone.
+    """
+    if host in _insecure_hosts:
+        return
+    _insecure_hosts.add(host)
+    warnings.filterwarnings(
+        'ignore', message=r"Unverified HTTPS request is being made to host '%s'" % re.escape(host),
+        category=urllib3.exceptions.InsecureRequestWarning)
+
+
+class RequestContext(object):
+    """What every request made under one generation of the settings has in
+    common: the URL prefixes, the SSL verification mode and the auth object.
+    """
+    def __init__(self, client):
+        self.generation = settings.generation
+        self.prefixes = {
+            True: client._build_prefix(True),
+            False: client._build_prefix(False),
+        }
+        self.verify = True
+        if (settings.verify_ssl is False) or hasattr(settings, 'insecure'):
+            self.verify = False
+        elif settings.certificate is not None:
+            self.verify = settings.certificate
+        self.auth = BasicTowerAuth(settings.username, settings.password, client)
+        self.transport = settings.transport
+        if not self.verify:
+            _ignore_insecure_warnings(urlparse(self.prefixes[True]).hostname)
+
+
 class Client(Session):
     """A class for making HTTP requests to the Ansible Tower API and
     returning the responses.
@@ -128,23 +297,71 @@ class Client(Session):
     def __init__(self):
         super(Client, self).__init__()
         for adapter in self.adapters.values():
-            adapter.max_retries = 3
+            adapter.max_retries = CONNECTION_RETRIES
+        self.cache = ResponseCache()
+        self.retry_counts = collections.Counter()
+        self.instruments = []
+        self._request_context = None
+        self._transport = 'requests'
+        self._requests_adapters = None
 
     def _make_request(self, method, url, args, kwargs):
-        # Decide whether to require SSL verification
-        verify_ssl = True
-        if (settings.verify_ssl is False) or hasattr(settings, 'insecure'):
-            verify_ssl = False
-        elif settings.certificate is not None:
-            verify_ssl = settings.certificate
-
+        """Send the request, retrying transient failures.
+
+        Requests with an idempotent method, and any request turned away with
+        a 429, are retried up to `retry_count` times, waiting as long as the
+        server asks in Retry-After or else a jittered exponential backoff.
+        Other requests are retried only if given an `idempotency_check`
+        callable: at once after a 503, which Tower sends for requests it did
+        not process, and after a 502 or 504 only if the check, called with
+        the failed response once the backoff has passed, confirms the failed
+        attempt had no effect.
+        """
+        idempotency_check = kwargs.pop('idempotency_check', None)
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            r = self._send(method, url, args, kwargs)
+            r.retries = attempt
+            if r.status_code not in RETRY_STATUSES or attempt >= settings.retry_count:
+                return r
+            unprocessed = r.status_code == 429 or (r.status_code == 503 and idempotency_check is not None)
+            if not (idempotent or unprocessed or idempotency_check):
+                return r
+            delay = self._retry_delay(attempt + 1, r)
+            debug.log('%s %s got HTTP %d; retry %d of %d in %.1fs.' % (
+                method, url, r.status_code, attempt + 1, settings.retry_count, delay
+            ), fg='yellow', bold=True)
+            time.sleep(delay)
+            # Behind a gateway error Tower may still be acting on the request,
+            # so only ask whether it did once it has had the backoff to finish.
+            if not (idempotent or unprocessed or idempotency_check(r)):
+                return r
+            attempt += 1
+            self.retry_counts[r.status_code] += 1
+            self.retry_counts['total'] += 1
+
+    @staticmethod
+    def _retry_delay(attempt, response):
+        """Return how many seconds to wait before the given retry attempt."""
+        delay = None
+        retry_after = response.headers.get('Retry-After')
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                when = parsedate_tz(retry_after)
+                if when is not None:
+                    delay = mktime_tz(when) - time.time()
+        if delay is None:
+            delay = random.uniform(0, settings.retry_backoff * 2 ** (attempt - 1))
+        return min(max(delay, 0), settings.retry_backoff_max)
+
+    def _send(self, method, url, args, kwargs):
         # Call the superclass method.
         try:
-            with warnings.catch_warnings():
-                warnings.simplefilter(
-                    "ignore", urllib3.exceptions.InsecureRequestWarning)
-                return super(Client, self).request(
-                    method, url, *args, verify=verify_ssl, **kwargs)
+            return super(Client, self).request(
+                method, url, *args, verify=self._context().verify, **kwargs)
         except SSLError as ex:
             # Throw error if verify_ssl not set to false and server
             #  is not using verified certificate.
@@ -175,10 +392,46 @@ class Client(Session):
                 'Right now it is: "%s".' % settings.host
             )
 
+    def _context(self):
+        """Return the request context for the current settings, building it
+        again only when they have changed.
+        """
+        context = self._request_context
+        if context is None or context.generation != settings.generation:
+            context = RequestContext(self)
+            if context.transport != self._transport:
+                self._use_transport(context.transport)
+            self._request_context = context
+        return context
+
+    def _use_transport(self, transport):
+        """Mount the adapters of the transport named in the settings,
+        falling back to the default requests adapters if it is unavailable.
+        """
+        try:
+            adapter = get_adapter(transport)
+        except ValueError as ex:
+            raise exc.TowerCLIError(str(ex))
+        except ImportError as ex:
+            debug.log('%s Falling back to the requests transport.' % ex, header='warning')
+            adapter = None
+
+        if self._requests_adapters is None:
+            self._requests_adapters = copy.copy(self.adapters)
+        if adapter is None:
+            self.adapters = copy.copy(self._requests_adapters)
+        else:
+            self.mount('https://', adapter)
+            self.mount('http://', adapter)
+        self._transport = transport
+
     def get_prefix(self, include_version=True):
         """Return the appropriate URL prefix to prepend to requests,
         based on the host provided in settings.
         """
+        return self._context().prefixes[bool(include_version)]
+
+    def _build_prefix(self, include_version):
         host = settings.host
         if '://' not in host:
             host = 'https://%s' % host.strip('/')
@@ -201,23 +454,35 @@ class Client(Session):
         # If the URL has the api/vX at the front strip it off
         # This is common to have if you are extracting a URL from an existing object.
         # For example, any of the 'related' fields of an object will have this
-        import re
-        url = re.sub("^/?api/v[0-9]+/", "", url)
+        url = API_VERSION_PREFIX.sub('', url)
 
         # Piece together the full URL.
-        use_version = not url.startswith('/o/')
-        url = '%s%s' % (self.get_prefix(use_version), url.lstrip('/'))
+        context = self._context()
+        prefix = context.prefixes[not url.startswith('/o/')]
+        endpoint = prefix + url.lstrip('/').split('/', 1)[0]
+        url = '%s%s' % (prefix, url.lstrip('/'))
+
+        # If response caching is on, serve repeated GETs of a detail or filtered list URL from the
+        # cache, revalidating stale entries that carry an ETag; any write invalidates the endpoint.
+        cache_key = cached = None
+        if settings.cache_ttl > 0:
+            if method.upper() in ('POST', 'PATCH', 'PUT', 'DELETE'):
+                self.cache.invalidate(endpoint)
+            elif method.upper() == 'GET' and self._is_cacheable(url, kwargs.get('params')):
+                cache_key = self.cache.key(url, kwargs.get('params'))
+                cached, fresh = self.cache.get(cache_key)
+                if fresh:
+                    debug.log('%s %s (cached)' % (method, url), fg='blue', bold=True)
+                    debug.log('')
+                    return copy.copy(cached)
+                if cached is not None and cached.headers.get('ETag'):
+                    kwargs['headers'] = dict(kwargs.get('headers') or {}, **{
+                        'If-None-Match': cached.headers['ETag']
+                    })
 
         # Ansible Tower expects authenticated requests; add the authentication
         # from settings if it's provided.
-        kwargs.setdefault(
-            'auth',
-            BasicTowerAuth(
-                settings.username,
-                settings.password,
-                self
-            )
-        )
+        kwargs.setdefault('auth', context.auth)
 
         # POST and PUT requests will send JSON by default; make this
         # the content_type by default.  This makes it such that we don't have
@@ -241,7 +506,21 @@ class Client(Session):
         if headers.get('Content-Type', '') == 'application/json':
             kwargs['data'] = json.dumps(kwargs.get('data', {}))
 
-        r = self._make_request(method, url, args, kwargs)
+        # Let any instruments observe the request, e.g. to profile it with --profile-http.
+        if settings.profile_http and http_profiler not in self.instruments:
+            http_profiler.enable()
+            self.instruments.append(http_profiler)
+        if self.instruments:
+            r = self._instrumented_request(method, url, args, kwargs)
+        else:
+            r = self._make_request(method, url, args, kwargs)
+
+        # The cached response is still current; keep it for another cache_ttl seconds.
+        if cache_key is not None and r.status_code == 304:
+            debug.log('%s %s (not modified)' % (method, url), fg='blue', bold=True)
+            debug.log('')
+            self.cache.refresh(cache_key)
+            return copy.copy(cached)
 
         # Sanity check: Did the server send back some kind of internal error?
         # If so, bubble this up.
@@ -252,6 +531,7 @@ class Client(Session):
         # Sanity check: Did we fail to authenticate properly?
         # If so, fail out now; this is always a failure.
         if r.status_code == 401:
+            BasicTowerAuth.forget_token(self.get_prefix())
             raise exc.AuthError('Invalid Tower authentication credentials (HTTP 401).')
 
         # Sanity check: Did we get a forbidden response, which means that
@@ -297,10 +577,55 @@ class Client(Session):
         # (defined below), which has a `json` method that doesn't lose key
         # order.
         r.__class__ = APIResponse
+        if cache_key is not None:
+            # Callers are free to change what `json` returns, so every cache hit is handed a copy of the
+            # response that decodes the body afresh.
+            self.cache.put(cache_key, copy.copy(r))
 
         # Return the response object.
         return r
 
+    def _instrumented_request(self, method, url, args, kwargs):
+        event = {
+            'method': method.upper(),
+            'url': url,
+            'endpoint': ID_SEGMENT.sub('/{id}', urlparse(url).path),
+            'start': clock(),
+        }
+        for instrument in self.instruments:
+            instrument.request_started(event)
+        r = error = None
+        try:
+            r = self._make_request(method, url, args, kwargs)
+            return r
+        except Exception as ex:
+            error = ex
+            raise
+        finally:
+            event.update({
+                'status': r.status_code if r is not None else None,
+                'latency': clock() - event['start'],
+                'bytes_out': len(r.request.body or '') if r is not None else len(kwargs.get('data') or ''),
+                'bytes_in': len(r.content) if r is not None else 0,
+                'retries': getattr(r, 'retries', 0),
+                'error': error,
+            })
+            for instrument in self.instruments:
+                instrument.request_finished(event)
+
+    @staticmethod
+    def _is_cacheable(url, params):
+        """Return True if a GET of this URL reads one record, or a list filtered by something other
+        than paging, of a resource that does not change by itself.
+        """
+        if UNCACHED_RESOURCES.intersection(urlparse(url).path.split('/')):
+            return False
+        if re.search(r'/\d+/$', url):
+            return True
+        if isinstance(params, dict):
+            params = params.items()
+        return any(k not in ('page', 'page_size') for k, v in params or ())
+
     @property
     @contextlib.contextmanager
     def test_mode(self):
@@ -330,8 +655,19 @@ class Client(Session):
 class APIResponse(Response):
     """A Response subclass which preseves JSON key order (but makes no other
     changes).
+
+    The body is decoded the first time `json` is called, and the result is
+    kept for later calls. Where dicts keep insertion order (Python 3.7+),
+    it is decoded into plain dicts, with orjson if that is installed;
+    elsewhere, into OrderedDicts.
     """
     def json(self, **kwargs):
+        if not kwargs:
+            decoded = self.__dict__.get('_json', _UNDECODED)
+            if decoded is _UNDECODED:
+                decoded = self._json = self._decode()
+            return decoded
+
         kwargs.setdefault('object_pairs_hook', data_structures.OrderedDict)
         try:
             return super(APIResponse, self).json(**kwargs)
@@ -339,5 +675,12 @@ class APIResponse(Response):
             kwargs.pop('object_pairs_hook', None)
             return super(APIResponse, self).json(**kwargs)
 
+    def _decode(self):
+        if not NATIVE_ORDERED_DICTS:
+            return super(APIResponse, self).json(object_pairs_hook=data_structures.OrderedDict)
+        if orjson is not None:
+            return orjson.loads(self.content)
+        return super(APIResponse, self).json()
+
 
 client = Client()
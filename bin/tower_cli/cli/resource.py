@@ -104,6 +104,11 @@ class ResSubcommand(click.MultiCommand):
             if getattr(method, 'deprecated', False):
                 debug.log('This method is deprecated in Tower 3.0.', header='warning')
 
+            # Human output only shows a few columns; fetch only those.
+            if (method.__name__ in ('list', 'get') and self.resource.sparse_human_output and
+                    (getattr(method, 'format_freezer', None) or settings.format) == 'human'):
+                kwargs.setdefault('fields', self._human_columns())
+
             result = method(*args, **kwargs)
 
             # If this was a request that could result in a modification
@@ -153,6 +158,14 @@ class ResSubcommand(click.MultiCommand):
             value = value.lower()
         return value
 
+    def _human_columns(self):
+        """Return the names of the columns shown in human output."""
+        columns = [field.name for field in self.resource.fields
+                   if field.display or settings.description_on and
+                   field.name == 'description']
+        columns.insert(0, 'id')
+        return columns
+
     def _format_human(self, payload):
         """Convert the payload into an ASCII table suitable for
         printing on screen and return it.
@@ -161,10 +174,7 @@ class ResSubcommand(click.MultiCommand):
         total_pages = None
 
         # What are the columns we will show?
-        columns = [field.name for field in self.resource.fields
-                   if field.display or settings.description_on and
-                   field.name == 'description']
-        columns.insert(0, 'id')
+        columns = self._human_columns()
 
         # Save a dictionary-by-name of fields for later use
         fields_by_name = {}
@@ -1,6 +1,7 @@
 import tower_cli
 from tower_cli.api import client
-from tower_cli.utils import debug
+from tower_cli.resolver import resolver
+from tower_cli.utils import debug, iter_pages
 from tower_cli.exceptions import TowerCLIError
 from tower_cli.resources.role import ACTOR_FIELDS
 
@@ -112,14 +113,14 @@ def resolve_asset_dependencies(an_asset, asset_type):
             else:
                 model_type = relation
 
+            identifier = get_identity(asset_type)
             try:
-                expanded_relation = tower_cli.get_resource(model_type).get(an_asset[relation])
+                value = resolver.value_of(model_type, an_asset[relation], identifier)
             except TowerCLIError as e:
                 raise TowerCLIError("Unable to get {} named {}: {}".format(model_type, an_asset[relation], e))
 
-            identifier = get_identity(asset_type)
-            if identifier in expanded_relation:
-                an_asset[relation] = expanded_relation[identifier]
+            if value is not None:
+                an_asset[relation] = value
 
 
 def get_identity(asset_type):
@@ -132,7 +133,7 @@ def get_identity(asset_type):
 
 def remove_encrypted_values(hash_name):
     for entry in hash_name:
-        if type(hash_name[entry]) == tower_cli.utils.data_structures.OrderedDict:
+        if isinstance(hash_name[entry], dict):
             remove_encrypted_values(hash_name[entry])
         elif hash_name[entry] == ENCRYPTED_VALUE:
             hash_name[entry] = ''
@@ -338,30 +339,27 @@ def process_inventory_groups(group_json):
 
 
 def load_all_assets(url_to_load):
-    keep_loading = True
     results = {
         'count': 0,
         'results': []
     }
 
-    while keep_loading:
-        # Assume we are done
-        keep_loading = False
+    for asset in iter_all_assets(url_to_load):
+        results['count'] += 1
+        results['results'].append(asset)
 
-        # Get the URL
-        response_object = client.request('GET', url_to_load)
-        response = response_object.json()
+    return results
 
-        # Update the count and results
-        results['count'] += response['count']
-        results['results'] += response['results']
 
-        # Check if we have a next
-        if 'next' in response and response['next']:
-            url_to_load = response['next']
-            keep_loading = True
+def iter_all_assets(url_to_load):
+    # Follow the "next" links, reading the following page while this one is consumed
+    def fetch(url):
+        response = client.request('GET', url).json()
+        return response['results'], response.get('next')
 
-    return results
+    for page in iter_pages(fetch, url_to_load):
+        for asset in page:
+            yield asset
 
 
 def extract_notifications(asset, notification_type):
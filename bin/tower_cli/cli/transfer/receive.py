@@ -33,16 +33,13 @@ class Receiver:
             # Load the API options for this asset_type of asset
             types_api_options = common.get_api_options(asset_type)
 
-            # Now we are going to extract the objects from Tower and put them into an array for processing
+            # Now we are going to extract the objects from Tower for processing
             acquired_assets_to_export = []
             identifier = common.get_identity(asset_type)
 
-            # Now we are either going to get everything or just one item and append that to the assets_to_export
+            # Now we are either going to stream everything or get just the named items
             if assets_to_export[asset_type]['all']:
-                resources = tower_cli.get_resource(asset_type).list(all_pages=True)
-                if 'results' not in resources:
-                    continue
-                acquired_assets_to_export = acquired_assets_to_export + resources['results']
+                acquired_assets_to_export = tower_cli.get_resource(asset_type).iter_all()
             else:
                 for name in assets_to_export[asset_type]['names']:
                     try:
@@ -1,6 +1,6 @@
 import tower_cli
 import json
-from tower_cli.exceptions import TowerCLIError, CannotStartJob, JobFailure
+from tower_cli.exceptions import TowerCLIError, CannotStartJob, JobFailure, NotFound, MultipleResults
 import tower_cli.cli.transfer.common as common
 from tower_cli.cli.transfer.logging_command import LoggingCommand
 from tower_cli.utils import parser
@@ -9,6 +9,7 @@ import click
 import os
 import sys
 from tower_cli.api import client
+from tower_cli.resolver import resolver
 import copy
 
 
@@ -45,6 +46,9 @@ class Sender(LoggingCommand):
             resource = tower_cli.get_resource(asset_type)
             post_options = common.get_api_options(asset_type)
 
+            # Learn the IDs of everything these assets depend on up front, rather than one lookup per reference
+            self.preload_asset_dependencies(asset_type, self.sorted_assets[asset_type])
+
             for an_asset in self.sorted_assets[asset_type]:
                 asset_name = an_asset[identifier]
 
@@ -664,8 +668,7 @@ class Sender(LoggingCommand):
 
             identifier = common.get_identity(dependency_type)
             try:
-                dependency_object = tower_cli.get_resource(dependency_type).get(**{identifier: an_asset[a_dependency]})
-                an_asset[a_dependency] = dependency_object["id"]
+                an_asset[a_dependency] = resolver.id_of(dependency_type, an_asset[a_dependency], identifier)
             except TowerCLIError:
                 self.log_error("Failed to resolve {} {} for {} {}".format(
                     a_dependency, an_asset[a_dependency], asset_type, an_asset[identifier])
@@ -674,6 +677,19 @@ class Sender(LoggingCommand):
 
         return resolution_succeeded
 
+    def preload_asset_dependencies(self, asset_type, assets):
+        for a_dependency in tower_cli.get_resource(asset_type).dependencies:
+            dependency_type = a_dependency
+            if a_dependency == 'vault_credential':
+                dependency_type = 'credential'
+
+            names = [an_asset[a_dependency] for an_asset in assets if a_dependency in an_asset]
+            try:
+                resolver.preload(dependency_type, names, common.get_identity(dependency_type))
+            except TowerCLIError:
+                # Anything we failed to preload will be looked up one at a time
+                pass
+
     # If an asset exists, this function is called
     # This function will decide if we need to actually update it or not
     # The three cases we want to catch:
@@ -1418,20 +1434,14 @@ class Sender(LoggingCommand):
                 self.log_error("Unable to remove existing notification {} : {}".format(notification_name, e))
 
     def get_item_by_name(self, asset_type, name):
-        # Get a list of items by name
-        item_response = tower_cli.get_resource(asset_type).list(**{'name': name})
-
-        if 'count' not in item_response:
-            raise TowerCLIError("Unable to get listing of {}".format(asset_type))
-
-        if 'count' in item_response and item_response['count'] == 0:
+        # Resolve the name to an ID, only asking Tower if it has not been seen yet
+        try:
+            return {'id': resolver.id_of(asset_type, name, 'name'), 'name': name}
+        except NotFound:
             raise TowerCLIError("{} named {} does not exist".format(asset_type, name))
-
-        if 'count' in item_response and item_response['count'] != 1:
+        except MultipleResults:
             raise TowerCLIError("{} named {} is not unique".format(asset_type, name))
 
-        return item_response['results'][0]
-
     def are_workflow_nodes_the_same(self, existing_nodes, new_nodes):
         existing_tree = self.expand_nodes(existing_nodes)
         new_tree = self.expand_nodes(new_nodes)
@@ -20,8 +20,8 @@ import six
 
 import click
 
-import tower_cli
 from tower_cli import exceptions as exc
+from tower_cli.resolver import resolver
 from tower_cli.utils import debug
 from tower_cli.utils.parser import string_to_dict
 from tower_cli.compat import OrderedDict
@@ -125,8 +125,6 @@ class Related(click.types.ParamType):
         """Return the appropriate integer value. If a non-integer is
         provided, attempt a name-based lookup and return the primary key.
         """
-        resource = tower_cli.get_resource(self.resource_name)
-
         # Ensure that None is passed through without trying to
         # do anything.
         if value is None:
@@ -153,8 +151,7 @@ class Related(click.types.ParamType):
         try:
             debug.log('The %s field is given as a name; '
                       'looking it up.' % param.name, header='details')
-            lookup_data = {resource.identity[-1]: value}
-            rel = resource.get(**lookup_data)
+            pk = resolver.id_of(self.resource_name, value)
         except exc.MultipleResults as ex:
             raise exc.MultipleRelatedError(
                 'Cannot look up {0} exclusively by name, because multiple {0} '
@@ -169,7 +166,7 @@ class Related(click.types.ParamType):
                                    (self.resource_name, str(ex)))
 
         # Done! Return the ID.
-        return rel['id']
+        return pk
 
     def get_metavar(self, param):
         return self.resource_name.upper()
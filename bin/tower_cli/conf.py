@@ -38,7 +38,9 @@ CONFIG_FILENAME = '.tower_cli.cfg'
 CONFIG_OPTIONS = frozenset((
     'host', 'username', 'password', 'verify_ssl', 'format',
     'color', 'verbose', 'description_on', 'certificate',
-    'use_token', 'oauth_token'
+    'use_token', 'oauth_token', 'cache_ttl', 'cache_size',
+    'retry_count', 'retry_backoff', 'retry_backoff_max', 'profile_http',
+    'transport'
 ))
 
 
@@ -116,7 +118,13 @@ class Settings(object):
         """Create the settings object, and read from appropriate files as
         well as from `sys.argv`.
         """
-        self._cache = {}
+        # Bumped whenever the runtime settings change, so that anything
+        # derived from the settings knows to derive it again.
+        self.generation = 0
+
+        # The merged, typed values of every setting, and the generation they
+        # were merged at; see `_values`.
+        self._snapshot = (None, {})
 
         # Initialize the data dictionary for the default level
         # precedence (that is, the bottom of the totem pole).
@@ -131,6 +139,13 @@ class Settings(object):
             'verbose': 'false',
             'description_on': 'false',
             'use_token': 'false',
+            'cache_ttl': '0',
+            'cache_size': '256',
+            'retry_count': '3',
+            'retry_backoff': '0.5',
+            'retry_backoff_max': '30',
+            'profile_http': 'false',
+            'transport': 'requests',
         })
         self._defaults = self._new_parser(defaults=defaults)
 
@@ -192,9 +207,8 @@ class Settings(object):
 
         # Iterate over each potential local config file and attempt to read
         # it (most won't exist, which is fine).
-        for local_dir in local_dirs:
-            local_filename = os.path.join(local_dir, CONFIG_FILENAME)
-            self._local.read(local_filename)
+        local_filenames = [os.path.join(d, CONFIG_FILENAME) for d in local_dirs]
+        self._local.read([f for f in local_filenames if os.path.isfile(f)])
 
         # Put a stubbed runtime parser in.
         self._runtime = self._new_parser()
@@ -203,40 +217,56 @@ class Settings(object):
         """Return the approprate value, intelligently type-casted in the
         case of numbers or booleans.
         """
-        # Sanity check: Have I cached this value? If so, return that.
-        if key in self._cache:
-            return self._cache[key]
-
-        # Run through each of the parsers and check for a value. Whenever
-        # we actually find a value, try to determine the correct type for it
-        # and cache and return a value of that type.
-        for parser in self._parsers:
-            # Get the value from this parser; if it's None, then this
-            # key isn't present and we move on to the next one.
-            try:
-                value = parser.get('general', key)
-            except configparser.NoOptionError:
-                continue
+        # Private names are never settings; refusing them here also keeps
+        # lookups made before `__init__` is done from recursing.
+        if key.startswith('_'):
+            raise AttributeError(key)
 
-            # We have a value; it may or may not be a string, though, so
-            # try to return it as an int, float, or boolean (in that order)
-            # before falling back to the string value.
-            type_method = ('getint', 'getfloat', 'getboolean')
-            for tm in type_method:
+        try:
+            value = self._values()[key.lower()]
+        except KeyError:
+            # If we got here, that means that the attribute wasn't found, and
+            # also that there is no default; raise an exception.
+            raise AttributeError('No setting exists: %s.' % key.lower())
+
+        # A value that could not be interpolated only fails when asked for,
+        # just as it would if it were read straight from its parser.
+        if isinstance(value, configparser.Error):
+            raise value
+        return value
+
+    def _values(self):
+        """Return a dictionary of every setting, merged across the parsers
+        by precedence and type-casted, rebuilding it only if the runtime
+        settings have changed since it was last built.
+        """
+        generation, values = self._snapshot
+        if generation == self.generation:
+            return values
+
+        # Run through each of the parsers from lowest precedence to highest,
+        # so that higher ones overwrite the values of lower ones. Try to
+        # determine the correct type for each value: an int, float, or
+        # boolean (in that order) before falling back to the string value.
+        generation = self.generation
+        values = {}
+        for parser in reversed(self._parsers):
+            for key in parser.options('general'):
                 try:
-                    value = getattr(parser, tm)('general', key)
-                    break
-                except ValueError:
-                    pass
-
-            # Write the value to the cache, so we don't have to do this lookup
-            # logic on subsequent requests.
-            self._cache[key] = value
-            return self._cache[key]
-
-        # If we got here, that means that the attribute wasn't found, and
-        # also that there is no default; raise an exception.
-        raise AttributeError('No setting exists: %s.' % key.lower())
+                    value = parser.get('general', key)
+                except configparser.Error as e:
+                    values[key] = e
+                    continue
+                for tm in ('getint', 'getfloat', 'getboolean'):
+                    try:
+                        value = getattr(parser, tm)('general', key)
+                        break
+                    except ValueError:
+                        pass
+                values[key] = value
+
+        self._snapshot = (generation, values)
+        return values
 
     @property
     def _parsers(self):
@@ -259,11 +289,13 @@ class Settings(object):
         """
         if self._runtime.has_option('general', key):
             self._runtime = self._new_parser()
+            self.generation += 1
 
         if value is None:
             return
         settings._runtime.set('general', key.replace('tower_', ''),
                               six.text_type(value))
+        self.generation += 1
 
     @contextlib.contextmanager
     def runtime_values(self, **kwargs):
@@ -293,9 +325,6 @@ class Settings(object):
                 kwargs.pop(k)
                 continue
 
-            # Remove these keys from the cache, if they are present.
-            self._cache.pop(k, None)
-
             # Coerce values to strings.
             kwargs[k] = six.text_type(v)
 
@@ -310,15 +339,12 @@ class Settings(object):
         try:
             self._runtime = Parser(defaults=kwargs)
             self._runtime.add_section('general')
+            self.generation += 1
             yield self
         finally:
             # Revert the runtime configparser object.
             self._runtime = old_runtime_parser
-
-            # Remove the keys from the cache again, since the settings
-            # have been reverted.
-            for key in kwargs:
-                self._cache.pop(k, None)
+            self.generation += 1
 
 
 def config_from_environment():
@@ -346,7 +372,7 @@ def _apply_runtime_setting(ctx, param, value):
 SETTINGS_PARMS = set([
     'tower_host', 'tower_oauth_token', 'tower_password', 'format',
     'tower_username', 'verbose', 'description_on', 'insecure', 'certificate',
-    'use_token'
+    'use_token', 'profile_http'
 ])
 
 
@@ -359,6 +385,7 @@ def runtime_context_manager(method):
         method(*args, **kwargs)
         # Destroy the runtime settings
         settings._runtime = settings._new_parser()
+        settings.generation += 1
     return method_with_context_managed
 
 
@@ -461,6 +488,17 @@ def with_global_options(method):
         required=False, callback=_apply_runtime_setting,
         is_eager=True
     )(method)
+
+    # Create a global option to profile the requests made to Tower.
+    method = click.option(
+        '--profile-http',
+        default=None,
+        help='Print the number and duration of requests made to each Tower '
+             'API endpoint when the command exits.',
+        is_flag=True,
+        required=False, callback=_apply_runtime_setting,
+        is_eager=True
+    )(method)
     # Manage the runtime settings context
     method = runtime_context_manager(method)
 
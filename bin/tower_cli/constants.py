@@ -16,6 +16,13 @@
 VERSION = '3.3.0'
 CUR_API_VERSION = 'v2'
 
+# Largest page_size Tower serves by default for list endpoints.
+MAX_PAGE_SIZE = 200
+
+# Longest `__in` filter value sent in one request by bulk lookups, in characters once URL-encoded; keeps the
+# whole request line well under the usual 4-8KB server limits.
+MAX_IN_FILTER_LENGTH = 2000
+
 LAUNCH_TYPE_CHOICES = [
     'manual', 'relaunch', 'relaunch', 'callback',
     'scheduled', 'dependency', 'workflow', 'sync', 'scm'
@@ -22,8 +22,12 @@ import sys
 import time
 from copy import copy
 from base64 import b64decode
+from datetime import datetime
+from email.utils import parsedate_tz, mktime_tz
+from multiprocessing.pool import ThreadPool
 
 import six
+from six.moves.urllib.parse import quote
 
 import click
 from click._compat import isatty as is_tty
@@ -31,8 +35,10 @@ from click._compat import isatty as is_tty
 from tower_cli import resources, exceptions as exc
 from tower_cli.api import client
 from tower_cli.conf import settings
+from tower_cli.resolver import resolver
+from tower_cli.constants import MAX_PAGE_SIZE, MAX_IN_FILTER_LENGTH
 from tower_cli.models.fields import Field, ManyToManyField
-from tower_cli.utils import parser, debug, secho
+from tower_cli.utils import parser, debug, secho, iter_pages
 from tower_cli.utils.data_structures import OrderedDict
 from tower_cli.utils.resource_decorators import disabled_getter, disabled_setter, disabled_deleter
 
@@ -167,6 +173,10 @@ class BaseResource(six.with_metaclass(ResourceMeta)):
     dependencies = []
     related = []
 
+    # Whether the human output of `list` and `get` can be built from just the displayed fields, so that
+    # records are trimmed to those as soon as they arrive.
+    sparse_human_output = True
+
     # The basic methods for interacting with a resource are `read`, `write`,
     # and `delete`; these cover basic CRUD situations and have options
     # to handle most desired behavior.
@@ -231,7 +241,12 @@ class BaseResource(six.with_metaclass(ResourceMeta)):
                                    read_params)
             return {}
 
-    def read(self, pk=None, fail_on_no_results=False, fail_on_multiple_results=False, **kwargs):
+    @staticmethod
+    def _project(record, fields):
+        """Return a copy of the record with only the given fields, plus its ID, in their original order."""
+        return type(record)((k, v) for k, v in record.items() if k == 'id' or k in fields)
+
+    def read(self, pk=None, fail_on_no_results=False, fail_on_multiple_results=False, fields=None, **kwargs):
         """
         =====API DOCS=====
         Retrieve and return objects from the Ansible Tower API.
@@ -247,6 +262,9 @@ class BaseResource(six.with_metaclass(ResourceMeta)):
                                          constitutes a failure case. (Note: This is meaningless if a primary
                                          key is included, as there can never be multiple results.)
         :type fail_on_multiple_results: bool
+        :param fields: Names of the only fields to keep in each object, besides ``id``; either a list or a
+                       comma-separated string. Other fields are dropped as soon as each page arrives.
+        :type fields: list
         :param query: Contains 2-tuples used as query parameters to filter resulting resource objects.
         :type query: list
         :param `**kwargs`: Keyword arguments which, all together, will be used as query parameters to filter
@@ -288,6 +306,17 @@ class BaseResource(six.with_metaclass(ResourceMeta)):
         r = client.get(url, params=kwargs)
         resp = r.json()
 
+        # Tower has no way to leave fields out of its responses, so if only some were asked for, drop the
+        # rest before anything else holds on to them.
+        if fields:
+            if isinstance(fields, six.string_types):
+                fields = fields.split(',')
+            fields = frozenset(fields)
+            if pk:
+                resp = self._project(resp, fields)
+            else:
+                resp['results'] = [self._project(record, fields) for record in resp['results']]
+
         # If this was a request with a primary key included, then at the
         # point that we got a good result, we know that we're done and can
         # return the result.
@@ -403,6 +432,7 @@ class BaseResource(six.with_metaclass(ResourceMeta)):
         if pk:
             url = self._get_patch_url(url, pk)
             method = 'PATCH'
+            resolver.forget(self.endpoint)
 
         # If debugging is on, print the URL and data being sent.
         debug.log('Writing the record.', header='details')
@@ -448,6 +478,7 @@ class BaseResource(six.with_metaclass(ResourceMeta)):
         # (this is an okay response if `fail_on_missing` is False).
         url = '%s%s/' % (self.endpoint, pk)
         debug.log('DELETE %s' % url, fg='blue', bold=True)
+        resolver.forget(self.endpoint)
         try:
             client.delete(url)
             return {'changed': True}
@@ -486,6 +517,81 @@ class BaseResource(six.with_metaclass(ResourceMeta)):
         response = self.read(pk=pk, fail_on_no_results=True, fail_on_multiple_results=True, **kwargs)
         return response['results'][0]
 
+    def get_many(self, values, field=None, fail_on_missing=False, fail_on_multiple_results=True, fields=None):
+        """
+        =====API DOCS=====
+        Retrieve many objects at once by their identity, using as few requests as possible.
+
+        The values are sent in ``<field>__in`` filters, split into chunks that keep each request URL short.
+
+        :param values: Values of ``field`` identifying the objects to retrieve.
+        :type values: list
+        :param field: Field the values are matched against; defaults to the last field of the resource's
+                      identity (usually ``name``). May be ``id``.
+        :type field: str
+        :param fail_on_missing: Flag that if set, a value matching no object raises an exception; otherwise, it
+                                is left out of the result.
+        :type fail_on_missing: bool
+        :param fail_on_multiple_results: Flag that if set, a value matching more than one object raises an
+                                         exception; otherwise, it is left out of the result.
+        :type fail_on_multiple_results: bool
+        :param fields: Names of the only fields to keep in each object, besides ``id`` and ``field``; either a
+                       list or a comma-separated string.
+        :type fields: list
+        :returns: A dictionary mapping each value found to the loaded JSON of its object.
+        :rtype: dict
+        :raises tower_cli.exceptions.NotFound: When some values match no object and ``fail_on_missing`` flag is
+                                               on.
+        :raises tower_cli.exceptions.MultipleResults: When some values match several objects and
+                                                      ``fail_on_multiple_results`` flag is on.
+
+        =====API DOCS=====
+        """
+        field = field or self.identity[-1]
+        wanted = OrderedDict((six.text_type(value), value) for value in values)
+        if isinstance(fields, six.string_types):
+            fields = fields.split(',')
+        if fields:
+            fields = list(fields) + [field]
+
+        # Values containing a comma can not be sent in an `__in` filter; look those up one at a time.
+        chunks, chunk, length = [], [], 0
+        for text in wanted:
+            if ',' in text:
+                chunks.append([text])
+                continue
+            if chunk and length + len(quote(text)) > MAX_IN_FILTER_LENGTH:
+                chunks.append(chunk)
+                chunk, length = [], 0
+            chunk.append(text)
+            length += len(quote(text)) + len(quote(','))
+        if chunk:
+            chunks.append(chunk)
+
+        debug.log('Getting %d records in %d requests.' % (len(wanted), len(chunks)), header='details')
+        matches = {}
+        for chunk in chunks:
+            if len(chunk) == 1:
+                query = [(field, chunk[0])]
+            else:
+                query = [('%s__in' % field, ','.join(chunk))]
+            for record in self.iter_all(query=query, page_size=MAX_PAGE_SIZE, fields=fields):
+                matches.setdefault(six.text_type(record.get(field)), []).append(record)
+
+        # Report anything missing or ambiguous.
+        missing = [text for text in wanted if text not in matches]
+        duplicates = [text for text in wanted if len(matches.get(text, ())) > 1]
+        if missing and fail_on_missing:
+            raise exc.NotFound('No %s found with %s: %s.' % (self.endpoint.strip('/'), field, ', '.join(missing)))
+        if duplicates and fail_on_multiple_results:
+            raise exc.MultipleResults('More than one %s found with %s: %s. Please tighten your criteria.' %
+                                      (self.endpoint.strip('/'), field, ', '.join(duplicates)))
+        if missing or duplicates:
+            debug.log('Missing: %s; not unique: %s.' % (', '.join(missing) or 'none', ', '.join(duplicates) or 'none'),
+                      header='details')
+        return OrderedDict((value, matches[text][0]) for text, value in wanted.items()
+                           if len(matches.get(text, ())) == 1)
+
     @resources.command(ignore_defaults=True, no_args_is_help=False)
     @click.option('all_pages', '-a', '--all-pages', is_flag=True, default=False, show_default=True,
                   help='If set, collate all pages of content from the API when returning results.')
@@ -497,7 +603,10 @@ class BaseResource(six.with_metaclass(ResourceMeta)):
                   help='A key and value to be passed as an HTTP query string key and value to the Tower API.'
                        ' Will be run through HTTP escaping. This argument may be sent multiple times.\n'
                        'Example: `--query foo bar` would be passed to Tower as ?foo=bar')
-    def list(self, all_pages=False, **kwargs):
+    @click.option('--page-workers', default=1, type=int, show_default=True,
+                  help='Number of pages to fetch concurrently with --all-pages. Above 1, pages are also '
+                       'requested at the largest page size Tower serves.')
+    def list(self, all_pages=False, page_workers=1, **kwargs):
         """Return a list of objects.
 
         If one or more filters are provided through keyword arguments, filter the results accordingly.
@@ -511,6 +620,10 @@ class BaseResource(six.with_metaclass(ResourceMeta)):
         :type all_pages: bool
         :param page: The page to show. Ignored if all_pages is set.
         :type page: int
+        :param page_workers: Number of pages to fetch concurrently when all_pages is set. Above 1, the
+                             remaining pages are fetched in parallel once the first page reports the
+                             total count, and pages are requested at the largest page size Tower serves.
+        :type page_workers: int
         :param query: Contains 2-tuples used as query parameters to filter resulting resource objects.
         :type query: list
         :param `**kwargs`: Keyword arguments list of available fields used for searching resource objects.
@@ -523,6 +636,8 @@ class BaseResource(six.with_metaclass(ResourceMeta)):
         if all_pages:
             kwargs.pop('page', None)
             kwargs.pop('page_size', None)
+            if page_workers > 1:
+                kwargs['page_size'] = MAX_PAGE_SIZE
 
         # Get the response.
         debug.log('Getting records.', header='details')
@@ -539,16 +654,64 @@ class BaseResource(six.with_metaclass(ResourceMeta)):
                 continue
             response[key] = int(match.groupdict()['num'])
 
+        # If we were asked for all pages and may fetch them concurrently, the first page tells us how many
+        # there are; fetch the rest at once and stitch them together in order.
+        if all_pages and response['next'] and page_workers > 1:
+            last_page = -(-response['count'] // len(response['results']))
+            response['results'] += self._read_pages(kwargs, range(2, last_page + 1), page_workers)
+            response['next'] = None
+
         # If we were asked for all pages, keep retrieving pages until we have them all.
-        if all_pages and response['next']:
-            cursor = copy(response)
-            while cursor['next']:
-                cursor = self.list(**dict(kwargs, page=cursor['next']))
-                response['results'] += cursor['results']
+        elif all_pages and response['next']:
+            response['results'].extend(self.iter_all(**dict(kwargs, page=response['next'])))
+            response['next'] = None
 
         # Done; return the response
         return response
 
+    def iter_all(self, **kwargs):
+        """Iterate over objects one at a time, following every page of results.
+
+        =====API DOCS=====
+        Lazily iterate over all objects matching the given filters.
+
+        Unlike ``list(all_pages=True)``, results are not accumulated: records are yielded as each page
+        arrives, and the next page is fetched in the background while the current one is consumed, so at
+        most two pages are held in memory however long the listing is.
+
+        :param page: The page to start from.
+        :type page: int
+        :param page_size: Number of records to request per page.
+        :type page_size: int
+        :param query: Contains 2-tuples used as query parameters to filter resulting resource objects.
+        :type query: list
+        :param `**kwargs`: Keyword arguments list of available fields used for searching resource objects.
+        :returns: A generator of resource objects returned by Tower backend.
+        :rtype: generator
+
+        =====API DOCS=====
+        """
+        page = kwargs.pop('page', None) or 1
+
+        def fetch(page):
+            response = self.read(**dict(kwargs, page=page))
+            match = re.search(r'page=(?P<num>[\d]+)', response.get('next') or '')
+            return response['results'], match and int(match.groupdict()['num'])
+
+        for results in iter_pages(fetch, page):
+            for record in results:
+                yield record
+
+    def _read_pages(self, kwargs, pages, workers):
+        """Read the given pages of results using up to `workers` concurrent requests, and return their
+        results concatenated in page order."""
+        pool = ThreadPool(min(workers, len(pages)))
+        try:
+            results = pool.map(lambda page: self.read(**dict(kwargs, page=page))['results'], pages)
+        finally:
+            pool.close()
+        return list(itertools.chain.from_iterable(results))
+
     def _assoc(self, url_fragment, me, other):
         """Associate the `other` record with the `me` record."""
 
@@ -993,6 +1156,27 @@ class ExeResource(MonitorableResource):
     """Executable resource - defines status and cancel methods"""
     abstract = True
 
+    def _launch_check(self, template_field, template_id, response=None):
+        """Return a callable for `Client.request`'s `idempotency_check`, telling from the failed response
+        whether a failed launch POST can safely be sent again.
+
+        No job of the template may have been created since the launch was sent, or the failed launch might
+        have started one after all. The launch is taken to have been sent no earlier than `response`, one
+        Tower sent just before it, says; without one, than the failed response says less the time the
+        request took. The launch is not retried if the response did not say what time it was.
+        """
+        def check(failed):
+            sent = parsedate_tz((response if response is not None else failed).headers.get('Date') or '')
+            if sent is None:
+                return False
+            sent = mktime_tz(sent)
+            if response is None:
+                sent -= failed.elapsed.total_seconds() + 1
+            since = datetime.utcfromtimestamp(sent).strftime('%Y-%m-%dT%H:%M:%SZ')
+            params = {template_field: template_id, 'created__gte': since, 'page_size': 1}
+            return client.get(self.endpoint, params=params).json()['count'] == 0
+        return check
+
     @resources.command
     @click.option('--detail', is_flag=True, default=False, help='Print more detail.')
     def status(self, pk=None, detail=False, **kwargs):
@@ -0,0 +1,123 @@
+# Copyright 2015, Ansible, Inc.
+# Luke Sneeringer <lsneeringer@ansible.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+import six
+
+import tower_cli
+from tower_cli import exceptions as exc
+from tower_cli.conf import settings
+from tower_cli.utils import debug
+
+
+AMBIGUOUS = object()
+
+
+class Resolver(object):
+    """Resolves names of Tower objects to primary keys, and primary keys back
+    to names, remembering every pair it has seen for the rest of the run.
+
+    Names that are not known yet are looked up one at a time; callers about
+    to resolve many names of the same resource can `preload` them in a few
+    filtered list requests first. A name shared by several objects resolves
+    to `MultipleResults`, just as a `get` by that name would.
+    """
+    def __init__(self):
+        self._ids = {}
+        self._values = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _index_key(resource, field):
+        return (settings.host, settings.username, resource.endpoint, field)
+
+    def _learn(self, resource, field, records):
+        key = self._index_key(resource, field)
+        with self._lock:
+            ids = self._ids.setdefault(key, {})
+            values = self._values.setdefault(key, {})
+            for record in records:
+                if field not in record:
+                    continue
+                value = six.text_type(record[field])
+                if ids.get(value, record['id']) != record['id']:
+                    ids[value] = AMBIGUOUS
+                else:
+                    ids[value] = record['id']
+                values[record['id']] = record[field]
+
+    def id_of(self, resource_name, value, field=None):
+        """Return the primary key of the `resource_name` object whose `field`
+        (by default, the last field of the resource's identity) is `value`.
+        """
+        resource = tower_cli.get_resource(resource_name)
+        field = field or resource.identity[-1]
+        pk = self._ids.get(self._index_key(resource, field), {}).get(six.text_type(value))
+        if pk is AMBIGUOUS:
+            raise exc.MultipleResults('Expected one result, got at least 2. Possibly caused by not providing '
+                                      'required fields. Please tighten your criteria.')
+        if pk is not None:
+            return pk
+        record = resource.get(fields=[field], **{field: value})
+        self._learn(resource, field, [record])
+        return record['id']
+
+    def value_of(self, resource_name, pk, field=None):
+        """Return the `field` (by default, the last field of the resource's
+        identity) of the `resource_name` object with primary key `pk`.
+        """
+        resource = tower_cli.get_resource(resource_name)
+        field = field or resource.identity[-1]
+        value = self._values.get(self._index_key(resource, field), {}).get(pk)
+        if value is not None:
+            return value
+        record = resource.get(pk, fields=[field])
+        self._learn(resource, field, [record])
+        return record.get(field)
+
+    def preload(self, resource_name, values, field=None):
+        """Learn the primary keys of every `resource_name` object whose
+        `field` is one of `values`, in as few requests as possible.
+
+        Values that are already known are skipped, and values that turn out
+        not to be unique are left to be looked up (and rejected) on demand.
+        """
+        resource = tower_cli.get_resource(resource_name)
+        field = field or resource.identity[-1]
+        known = self._ids.get(self._index_key(resource, field), {})
+        wanted = sorted(set(six.text_type(v) for v in values) - set(known))
+        if not wanted:
+            return
+        debug.log('Preloading %d %s records.' % (len(wanted), resource_name), header='details')
+        records = resource.get_many(wanted, field, fail_on_multiple_results=False, fields=[field])
+        self._learn(resource, field, records.values())
+
+    def forget(self, endpoint):
+        """Drop everything known about the objects under `endpoint`, for
+        when they are modified or deleted.
+        """
+        with self._lock:
+            for index in (self._ids, self._values):
+                for key in [k for k in index if k[2] == endpoint]:
+                    del index[key]
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+            self._values.clear()
+
+
+resolver = Resolver()
@@ -23,6 +23,7 @@ class Resource(models.BaseResource):
     This resource is read-only.
     """
     cli_help = 'Activity on server.'
+    sparse_human_output = False
     endpoint = '/activity_stream/'
 
     operation = models.Field(display=True)
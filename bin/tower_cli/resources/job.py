@@ -210,7 +210,8 @@ class Resource(models.ExeResource):
         # If there are any such passwords on this job, ask for them now.
         debug.log('Asking for information necessary to start the job.',
                   header='details')
-        job_start_info = client.get(endpoint).json()
+        job_start_response = client.get(endpoint)
+        job_start_info = job_start_response.json()
         for password in job_start_info.get('passwords_needed_to_start', []):
             start_data[password] = getpass('Password for %s: ' % password)
 
@@ -218,7 +219,9 @@ class Resource(models.ExeResource):
         debug.log('Launching the job.', header='details')
         self._pop_none(kwargs)
         kwargs.update(start_data)
-        job_started = client.post(endpoint, data=kwargs)
+        job_started = client.post(endpoint, data=kwargs, idempotency_check=self._launch_check(
+            'job_template', jt['id'], job_start_response
+        ))
 
         # Get the job ID from the result.
         job_id = job_started.json()['id']
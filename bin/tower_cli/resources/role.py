@@ -44,6 +44,7 @@ class Resource(models.Resource):
     automatically generated along with the connected resource.
     """
     cli_help = 'Add and remove users/teams from roles.'
+    sparse_human_output = False
     endpoint = '/roles/'
 
     user = models.Field(type=types.Related('user'),
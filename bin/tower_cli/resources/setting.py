@@ -29,6 +29,7 @@ from tower_cli.utils.data_structures import OrderedDict
 class Resource(models.Resource):
     """A resource for Tower configurations."""
     cli_help = 'Manage settings within Ansible Tower.'
+    sparse_human_output = False
     custom_category = None
 
     value = models.Field(required=True, type=types.Variables())
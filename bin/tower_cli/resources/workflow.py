@@ -20,6 +20,7 @@ from tower_cli.cli import types
 from tower_cli.utils.parser import string_to_dict
 from tower_cli.exceptions import BadRequest
 from tower_cli.conf import settings
+from tower_cli.resolver import resolver
 from tower_cli.resources.node import NODE_STANDARD_FIELDS, JOB_TYPES
 
 import click
@@ -39,9 +40,7 @@ class TreeNode(object):
                 continue
             if fd in FK_FIELDS and not isinstance(data[fd], int):
                 # Node's template was given by name, do lookup
-                ujt_res = get_resource(fd)
-                ujt_data = ujt_res.get(name=data[fd])
-                node_attrs[fd] = ujt_data['id']
+                node_attrs[fd] = resolver.id_of(fd, data[fd], 'name')
             else:
                 node_attrs[fd] = data[fd]
         node_attrs['workflow_job_template'] = wfjt
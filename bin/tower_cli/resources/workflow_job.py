@@ -145,10 +145,13 @@ class Resource(models.ExeResource):
         if extra_vars is not None and len(extra_vars) > 0:
             kwargs['extra_vars'] = parser.process_extra_vars(extra_vars)
 
+        # A launch that fails in transit is retried only if it did not start a job.
+        endpoint = 'workflow_job_templates/{0}/launch/'.format(workflow_job_template)
+        launch_check = self._launch_check('workflow_job_template', workflow_job_template)
+
         debug.log('Launching the workflow job.', header='details')
         self._pop_none(kwargs)
-        post_response = client.post('workflow_job_templates/{0}/launch/'.format(
-            workflow_job_template), data=kwargs).json()
+        post_response = client.post(endpoint, data=kwargs, idempotency_check=launch_check).json()
 
         workflow_job_id = post_response['id']
         post_response['changed'] = True
@@ -0,0 +1,114 @@
+# Copyright 2015, Ansible, Inc.
+# Luke Sneeringer <lsneeringer@ansible.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import threading
+
+from requests.adapters import BaseAdapter
+from requests.exceptions import ConnectionError, ReadTimeout, SSLError, Timeout
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+try:
+    import httpx
+    import h2  # NOQA
+except ImportError:
+    httpx = None
+
+
+# Headers that only make sense for one HTTP/1.1 connection, and which
+# HTTP/2 forbids.
+HOP_BY_HOP_HEADERS = frozenset((
+    'connection', 'keep-alive', 'proxy-connection', 'transfer-encoding', 'upgrade',
+))
+
+TRANSPORTS = ('requests', 'http2')
+
+
+class HTTP2Adapter(BaseAdapter):
+    """A requests transport adapter sending requests over HTTP/2 with httpx,
+    so that concurrent requests to Tower are multiplexed over one connection
+    instead of each needing a socket of its own.
+
+    Servers that do not negotiate HTTP/2 are spoken to over HTTP/1.1. The
+    adapter returns ordinary `requests` responses and raises `requests`
+    exceptions, so callers cannot tell it apart from the default adapter.
+    Requires the optional `httpx[http2]` package.
+    """
+    def __init__(self):
+        super(HTTP2Adapter, self).__init__()
+        if httpx is None:
+            raise ImportError('The http2 transport requires the httpx[http2] package.')
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def _client(self, verify, cert):
+        key = (verify or False, cert)
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = httpx.Client(http2=True, verify=verify or False, cert=cert)
+            return self._clients[key]
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if isinstance(timeout, tuple):
+            timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+        else:
+            timeout = httpx.Timeout(timeout)
+        headers = [(k, v) for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP_HEADERS]
+        started = datetime.datetime.utcnow()
+        try:
+            r = self._client(verify, cert).request(request.method, request.url, headers=headers,
+                                                   content=request.body, timeout=timeout)
+        except httpx.ConnectTimeout as e:
+            raise Timeout(e, request=request)
+        except httpx.TimeoutException as e:
+            raise ReadTimeout(e, request=request)
+        except httpx.ConnectError as e:
+            if 'CERTIFICATE' in str(e) or 'SSL' in str(e):
+                raise SSLError(e, request=request)
+            raise ConnectionError(e, request=request)
+        except httpx.TransportError as e:
+            raise ConnectionError(e, request=request)
+
+        response = Response()
+        response.status_code = r.status_code
+        response.reason = r.reason_phrase
+        response.headers = CaseInsensitiveDict(r.headers.multi_items())
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = r.content
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.elapsed = datetime.datetime.utcnow() - started
+        response.http_version = r.http_version
+        return response
+
+    def close(self):
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+
+
+def get_adapter(transport):
+    """Return a new transport adapter of the named kind, or None to keep the
+    default `requests` adapters.
+    """
+    if transport not in TRANSPORTS:
+        raise ValueError('Unknown transport %r; expected one of: %s.' % (transport, ', '.join(TRANSPORTS)))
+    if transport == 'http2':
+        return HTTP2Adapter()
+    return None
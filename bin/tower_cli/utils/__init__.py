@@ -14,6 +14,7 @@
 # limitations under the License.
 
 import functools
+from multiprocessing.pool import ThreadPool
 
 import click
 
@@ -44,3 +45,24 @@ def supports_oauth():
     except exceptions.NotFound:
         return False
     return resp.ok
+
+
+def iter_pages(fetch, cursor):
+    """Yield the pages of a paginated listing, reading the next page ahead
+    while the current one is being consumed.
+
+    `fetch` is called with a cursor and must return a 2-tuple of the page
+    and the cursor of the page after it, or a false value if it was the
+    last page. At most two pages are held in memory at a time; if the
+    caller stops iterating early, a page that is still in flight is
+    discarded.
+    """
+    pool = ThreadPool(1)
+    try:
+        pending = pool.apply_async(fetch, (cursor,))
+        while pending is not None:
+            page, cursor = pending.get()
+            pending = pool.apply_async(fetch, (cursor,)) if cursor else None
+            yield page
+    finally:
+        pool.close()
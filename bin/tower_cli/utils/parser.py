@@ -22,6 +22,7 @@ import sys
 import six
 
 from tower_cli import exceptions as exc
+from tower_cli.api import NATIVE_ORDERED_DICTS
 from tower_cli.utils import debug
 from tower_cli.utils.data_structures import OrderedDict
 
@@ -173,4 +174,8 @@ def ordered_dump(data, Dumper=yaml.Dumper, **kws):
             data.items())
     OrderedDumper.add_representer(OrderedDict,
                                   _dict_representer)
+    # API responses are plain dicts where those keep insertion order; keep it
+    # rather than sorting their keys. Elsewhere, sorted keys are all we have.
+    if NATIVE_ORDERED_DICTS:
+        OrderedDumper.add_representer(dict, _dict_representer)
     return yaml.dump(data, None, OrderedDumper, **kws)
@@ -0,0 +1,103 @@
+# Copyright 2015, Ansible, Inc.
+# Luke Sneeringer <lsneeringer@ansible.com>
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import atexit
+import threading
+
+import click
+
+
+class Instrument(object):
+    """Base class for objects observing the requests made by a
+    `tower_cli.api.Client`; add an instance to the client's `instruments`.
+
+    Both callbacks receive the same dictionary for a request, with the
+    keys `method`, `url`, `endpoint` (the URL path with primary keys
+    replaced by `{id}`, e.g. `/api/v2/job_templates/{id}/launch/`) and
+    `start`. Before `request_finished` is called, `status` (None if no
+    response arrived), `latency` in seconds, `bytes_out`, `bytes_in`,
+    `retries` (how many times a transient failure was retried) and `error`
+    are added. Callbacks run on the requesting thread and must
+    not raise.
+    """
+    def request_started(self, event):
+        pass
+
+    def request_finished(self, event):
+        pass
+
+
+def percentile(values, p):
+    """Return the nearest-rank `p`th percentile of the sorted `values`."""
+    rank = max(-(-len(values) * p // 100), 1)
+    return values[int(rank) - 1]
+
+
+class HTTPProfiler(Instrument):
+    """Aggregates request latencies per method and endpoint template, and
+    prints a summary table once the process exits.
+    """
+    def __init__(self):
+        self.latencies = {}
+        self.bytes_in = {}
+        self.errors = {}
+        self.retries = {}
+        self._lock = threading.Lock()
+        self._enabled = False
+
+    def enable(self):
+        if not self._enabled:
+            self._enabled = True
+            atexit.register(self.report)
+
+    def request_finished(self, event):
+        key = (event['endpoint'], event['method'])
+        with self._lock:
+            self.latencies.setdefault(key, []).append(event['latency'])
+            self.bytes_in[key] = self.bytes_in.get(key, 0) + event['bytes_in']
+            self.retries[key] = self.retries.get(key, 0) + event['retries']
+            if event['error'] is not None or (event['status'] or 0) >= 400:
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+    def summary(self):
+        """Return the table of requests made so far, slowest endpoint first."""
+        header = ('Endpoint', 'Method', 'Count', 'Errors', 'Retries', 'Total s', 'p50 ms', 'p95 ms', 'KB in')
+        rows = []
+        with self._lock:
+            for key, latencies in self.latencies.items():
+                latencies = sorted(latencies)
+                rows.append((key[0], key[1], str(len(latencies)), str(self.errors.get(key, 0)),
+                             str(self.retries.get(key, 0)), '%.2f' % sum(latencies),
+                             '%.0f' % (percentile(latencies, 50) * 1000), '%.0f' % (percentile(latencies, 95) * 1000),
+                             '%.1f' % (self.bytes_in[key] / 1024.0)))
+        rows.sort(key=lambda row: -float(row[5]))
+        total = sum(sum(latencies) for latencies in self.latencies.values())
+        count = sum(len(latencies) for latencies in self.latencies.values())
+        rows.append(('(all)', '', str(count), str(sum(self.errors.values())), str(sum(self.retries.values())),
+                     '%.2f' % total, '', '', ''))
+
+        widths = [max(len(row[i]) for row in rows + [header]) for i in range(len(header))]
+        lines = []
+        for row in [header, tuple('=' * w for w in widths)] + rows:
+            lines.append('  '.join(cell.ljust(w) if i < 2 else cell.rjust(w)
+                                   for i, (cell, w) in enumerate(zip(row, widths))).rstrip())
+        return '\n'.join(lines)
+
+    def report(self):
+        if self.latencies:
+            click.echo(self.summary(), err=True)
+
+
+http_profiler = HTTPProfiler()